@@ -0,0 +1,253 @@
+"""Асинхронные представления самых частых GET-запросов (ASGI).
+
+Под ASGI (foodgram.asgi, ASYNC_VIEWS) список и карточка рецепта,
+выгрузка списка покупок, теги, ингредиенты и короткие ссылки
+обслуживаются этими представлениями. Ответы из памяти процесса (кэш
+справочников, кэш коротких ссылок) отдаются прямо в цикле событий. Все
+остальное - ORM, DRF и сериализаторы, которые остаются синхронными, -
+выполняется в пуле из ASYNC_DB_THREADS потоков (run_sync). Пока запрос
+ждет базу, процесс принимает и обслуживает другие запросы, а число
+одновременных соединений с базой ограничено размером пула потоков.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.request import Request
+
+from .catalog_cache import cached_response
+from .timing import current_timings, timed_queries
+from .views import ShortLinkView
+from recipes.short_links import recipe_ids
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix="orm"
+)
+# Сколько готовых частей потокового ответа ждут отправки.
+STREAM_QUEUE_SIZE = 8
+STREAM_END = object()
+
+
+def in_request(func):
+    """func в границах запроса: соединения потока пула закрываются (или
+    возвращаются в пул соединений) так же, как после обычного запроса,
+    а их запросы попадают в замеры Server-Timing."""
+    @wraps(func)
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            with timed_queries(current_timings.get()):
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return call
+
+
+async def run_sync(func, *args, **kwargs):
+    """Выполняет синхронный func в пуле потоков ORM."""
+    return await sync_to_async(
+        in_request(func), thread_sensitive=False, executor=db_executor
+    )(*args, **kwargs)
+
+
+def rendered(view):
+    """Синхронное представление, ответ которого отрендерен сразу:
+    рендеринг браузерной версии API тоже обращается к базе.
+
+    Потоковый ответ помечается: его части строит поток пула (см.
+    ASGIHandler).
+    """
+    @wraps(view)
+    def call(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        if response.streaming:
+            response.streamed_in_pool = True
+        return response
+    return call
+
+
+async def stream_in_pool(response):
+    """Части потокового ответа, которые строятся в одном потоке пула ORM.
+
+    Поток кладет части в очередь на STREAM_QUEUE_SIZE частей и ждет, пока
+    в ней освободится место, поэтому в памяти не больше нескольких частей,
+    а первая уходит клиенту сразу. Курсор базы остается в том потоке, где
+    открыт; там же ответ и закрывается.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stopped = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            for part in response:
+                if stopped.is_set():
+                    return
+                put(part)
+        except Exception as error:
+            if not stopped.is_set():
+                put(error)
+            return
+        finally:
+            response.close()
+        put(STREAM_END)
+
+    producer = asyncio.ensure_future(run_sync(produce))
+    try:
+        while True:
+            part = await queue.get()
+            if part is STREAM_END:
+                break
+            if isinstance(part, Exception):
+                raise part
+            yield part
+    finally:
+        # Клиент отключился или отправка прервалась: поток дочитывает
+        # ожидающую часть и выходит.
+        stopped.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
+
+
+def response_headers(response):
+    """Заголовки ответа с cookies, как их отправляет ASGIHandler."""
+    headers = []
+    for header, value in response.items():
+        if isinstance(header, str):
+            header = header.encode("ascii")
+        if isinstance(value, str):
+            value = value.encode("latin1")
+        headers.append((bytes(header), bytes(value)))
+    for cookie in response.cookies.values():
+        headers.append(
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+        )
+    return headers
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """ASGIHandler, отдающий потоковые ответы асинхронных представлений
+    по частям из пула потоков ORM: Django 3.2 перебирает потоковый ответ
+    прямо в цикле событий, где ORM недоступна."""
+
+    async def send_response(self, response, send):
+        if not getattr(response, "streamed_in_pool", False):
+            return await super().send_response(response, send)
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": response_headers(response),
+        })
+        parts = stream_in_pool(response)
+        try:
+            async for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    })
+        finally:
+            await parts.aclose()
+        await send({"type": "http.response.body"})
+
+
+def threaded_view(view):
+    """Асинхронная обертка: запрос целиком выполняется в пуле потоков."""
+    view = rendered(view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run_sync(view, request, *args, **kwargs)
+    return async_view
+
+
+def wants_json(request):
+    """Запрос JSON-ответа (а не браузерной версии API)."""
+    return (
+        request.method == "GET"
+        and request.GET.get("format", "json") == "json"
+        and "text/html" not in request.META.get("HTTP_ACCEPT", "")
+    )
+
+
+def catalog_list_view(view):
+    """Список справочника: попадание в кэш ответов - в цикле событий."""
+    threaded = threaded_view(view)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        # Формат в суффиксе пути (tags.api) выбирает DRF.
+        if not kwargs and wants_json(request):
+            viewset = view.cls(**view.initkwargs)
+            viewset.request = Request(request)
+            viewset.action = "list"
+            # Копия версии справочников в процессе; если она устарела,
+            # версию перечитает поток пула.
+            key = viewset.get_cache_key(refresh=False)
+            if key is not None:
+                response = cached_response(request, key)
+                if response is not None:
+                    return response
+        return await threaded(request, *args, **kwargs)
+    return async_view
+
+
+def short_link_view(view):
+    """Короткая ссылка: известная ссылка - в цикле событий."""
+    threaded = threaded_view(view)
+
+    @wraps(view)
+    async def async_view(request, encoded_id):
+        recipe_id = ShortLinkView.cached(encoded_id, refresh=False)
+        if (
+            recipe_id is not None
+            and not recipe_ids.is_stale(refresh=False)
+            and recipe_ids.may_exist(recipe_id)
+        ):
+            return ShortLinkView.redirect(request, recipe_id)
+        return await threaded(request, encoded_id=encoded_id)
+    return async_view
+
+
+# Имя маршрута -> асинхронная обертка его представления.
+ASYNC_VIEWS = {
+    "recipes-list": threaded_view,
+    "recipes-detail": threaded_view,
+    "recipes-download-shopping-cart": threaded_view,
+    "tags-list": catalog_list_view,
+    "tags-detail": threaded_view,
+    "ingredients-list": catalog_list_view,
+    "ingredients-detail": threaded_view,
+    "shortlink": short_link_view,
+}
+
+
+def async_patterns(patterns):
+    """Маршруты, в которых представления из ASYNC_VIEWS заменены
+    асинхронными (при выключенной настройке - без изменений)."""
+    if not settings.ASYNC_VIEWS:
+        return patterns
+    return [
+        URLPattern(
+            pattern.pattern,
+            ASYNC_VIEWS[pattern.name](pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in ASYNC_VIEWS
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,216 @@
+"""Аутентификация по токену без запроса к базе на каждый запрос.
+
+Снимок пользователя (значения полей, кроме пароля) хранится по ключу
+токена в памяти процесса - LRU на AUTH_TOKEN_CACHE_SIZE записей, каждая
+живет AUTH_TOKEN_CACHE_TTL секунд. Снимок сбрасывается при удалении
+токена (выход), сохранении пользователя (смена пароля, деактивация,
+изменение профиля) и его удалении, см. api.signals.
+
+Сброс виден другим процессам через общий кэш AUTH_TOKEN_SHARED_CACHE:
+там хранится время сброса пользователя и версия сбросов
+(recipes.versions.SharedVersion). Процесс перечитывает версию не чаще
+раза в SHARED_VERSION_TTL секунд и, если она изменилась, одним запросом
+сверяет свои снимки с метками сброса их пользователей. Поэтому запрос со
+снимком в памяти не обращается ни к кэшу, ни к базе, а сброс в другом
+процессе действует не позже чем через SHARED_VERSION_TTL. Изменения
+пользователя через QuerySet.update() сигналов не отправляют и видны
+только после истечения AUTH_TOKEN_CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.fields.files import FieldFile
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import COUNTERS
+from recipes.versions import SharedVersion
+
+User = get_user_model()
+
+SHARED_REVOKED_KEY = "auth-token-revoked:{}"
+REVOCATIONS_KEY = "auth-token-revocations"
+# Ключей в одном get_many (SQLite ограничивает число параметров запроса).
+REVOKED_BATCH_SIZE = 500
+# Счетчики меняются UPDATE без сигналов, поэтому в снимок не входят:
+# они загружаются из базы при обращении, а save() их не перезаписывает.
+# Пароль тоже загружается только при обращении.
+FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.name != "password"
+    and (settings.AUTH_USER_MODEL, field.name) not in {
+        (model, counter) for model, counter, *_ in COUNTERS
+    }
+)
+
+
+def snapshot(user):
+    """Значения полей пользователя, пригодные для хранения в кэше."""
+    values = []
+    for name in FIELDS:
+        value = getattr(user, name)
+        if isinstance(value, FieldFile):
+            value = value.name
+        values.append(value)
+    return tuple(values)
+
+
+def restore(values):
+    """Новый объект пользователя из снимка (у каждого запроса свой)."""
+    return User.from_db(DEFAULT_DB_ALIAS, FIELDS, values)
+
+
+class TokenCache:
+    """Снимки пользователей по ключам токенов."""
+
+    def __init__(self):
+        # Ключ токена -> (истекает, создан, id пользователя, снимок).
+        self.entries = OrderedDict()
+        # id пользователя -> время последнего известного сброса (за
+        # последний AUTH_TOKEN_CACHE_TTL).
+        self.revoked = OrderedDict()
+        self.revocations = SharedVersion(
+            REVOCATIONS_KEY, settings.AUTH_TOKEN_SHARED_CACHE
+        )
+        # Версия сбросов, с которой сверены снимки, и время начала
+        # сверки, заметившей новые сбросы.
+        self.seen = None
+        self.synced_at = 0
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[settings.AUTH_TOKEN_SHARED_CACHE]
+
+    def get(self, key):
+        """Снимок пользователя или None."""
+        self.sync()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] <= time.monotonic():
+                    del self.entries[key]
+                    entry = None
+                else:
+                    self.entries.move_to_end(key)
+        if entry is None:
+            return None
+        # Снимок, прочитанный до сброса, недействителен.
+        if self.revoked.get(entry[2], 0) >= entry[1]:
+            self.drop(key)
+            return None
+        return entry[3]
+
+    def sync(self):
+        """Сверяет снимки со сбросами в других процессах, если версия
+        сбросов изменилась (не чаще раза в SHARED_VERSION_TTL)."""
+        if self.revocations.local() is not None:
+            return
+        with self.sync_lock:
+            if self.revocations.local() is not None:
+                return
+            started = time.time()
+            # Версия читается раньше меток: сброс, записанный после
+            # чтения меток, изменит ее и будет учтен следующей сверкой.
+            version = self.revocations.refresh()
+            if version == self.seen:
+                return
+            with self.lock:
+                user_ids = sorted(
+                    {entry[2] for entry in self.entries.values()}
+                )
+            for start in range(0, len(user_ids), REVOKED_BATCH_SIZE):
+                keys = {
+                    SHARED_REVOKED_KEY.format(user_id): user_id
+                    for user_id in user_ids[start:start + REVOKED_BATCH_SIZE]
+                }
+                for name, revoked in self.shared.get_many(keys).items():
+                    self.remember(keys[name], revoked)
+            self.seen = version
+            self.synced_at = started
+
+    def remember(self, user_id, revoked):
+        """Учитывает сброс пользователя в момент revoked."""
+        now = time.time()
+        with self.lock:
+            if revoked > self.revoked.get(user_id, 0):
+                self.revoked[user_id] = revoked
+                self.revoked.move_to_end(user_id)
+            # Более ранние сбросы старше любого живого снимка.
+            while self.revoked and next(iter(self.revoked.values())) < (
+                now - settings.AUTH_TOKEN_CACHE_TTL
+            ):
+                self.revoked.popitem(last=False)
+            for key in [
+                key for key, entry in self.entries.items()
+                if entry[2] == user_id and entry[1] <= revoked
+            ]:
+                del self.entries[key]
+
+    def put(self, key, created, user_id, values):
+        entry = (
+            time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL,
+            created,
+            user_id,
+            values,
+        )
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+        return entry
+
+    def set(self, key, user, created):
+        """Сохраняет снимок user, прочитанного из базы в момент created."""
+        # Пользователя, прочитанного до последней сверки, она не
+        # проверяла: снимок не сохраняется.
+        if created < self.synced_at or (
+            self.revoked.get(user.pk, 0) >= created
+        ):
+            return
+        self.put(key, created, user.pk, snapshot(user))
+
+    def drop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        """Сбрасывает снимки всех токенов пользователя во всех
+        процессах."""
+        now = time.time()
+        self.shared.set(
+            SHARED_REVOKED_KEY.format(user_id),
+            now,
+            settings.AUTH_TOKEN_CACHE_TTL,
+        )
+        self.revocations.bump()
+        self.remember(user_id, now)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.revoked.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, берущий пользователя из token_cache."""
+
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        if values is not None:
+            user = restore(values)
+            return (user, Token(key=key, user=user))
+        started = time.time()
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, started)
+        return (user, token)
@@ -0,0 +1,164 @@
+"""Кэш готовых ответов для справочников тегов и ингредиентов.
+
+Справочники одинаковы для всех пользователей, поэтому ответ хранится
+уже отрендеренным JSON (и сжатым gzip/brotli) под версией справочников.
+ETag вычисляется из версии и параметров запроса, так что ``304 Not
+Modified`` отдается до обращения к базе и сериализатору (копию версии
+процесс перечитывает не чаще раза в SHARED_VERSION_TTL секунд).
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+from recipes.catalog import catalog_version
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с ограничением числа записей."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+catalog_cache = LRUCache(settings.CATALOG_CACHE_SIZE)
+
+
+def encode_variants(content):
+    """Варианты тела ответа по Content-Encoding."""
+    variants = {
+        "identity": content,
+        "gzip": gzip.compress(content, compresslevel=GZIP_LEVEL),
+    }
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=BROTLI_QUALITY)
+    return variants
+
+
+def choose_encoding(request, variants):
+    accepted = set()
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = coding.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00"):
+            accepted.add(name.strip().lower())
+    for coding in ("br", "gzip"):
+        if coding in accepted and coding in variants:
+            return coding
+    return "identity"
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (
+        tag.strip().replace("W/", "", 1) for tag in header.split(",")
+    )
+
+
+def set_cache_headers(response, etag):
+    # 304 несет те же заголовки кэширования, что и полный ответ.
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "no-cache"
+
+
+def cached_response(request, key, variants=None):
+    """Ответ из кэша для ключа key или None, если его там нет."""
+    etag = '"{}"'.format(hashlib.sha1(repr(key).encode()).hexdigest())
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        set_cache_headers(response, etag)
+        return response
+    if variants is None:
+        variants = catalog_cache.get(key)
+        if variants is None:
+            return None
+    encoding = choose_encoding(request, variants)
+    response = HttpResponse(
+        variants[encoding], content_type="application/json"
+    )
+    if encoding != "identity":
+        response["Content-Encoding"] = encoding
+    set_cache_headers(response, etag)
+    return response
+
+
+class CatalogCacheMixin:
+    """Отдает список справочника из кэша готовых ответов.
+
+    Кэшируется только JSON; браузерная версия API работает как раньше.
+    """
+
+    # Справочники одинаковы для всех, аутентификация им не нужна.
+    authentication_classes = ()
+
+    def get_cache_key(self, refresh=True):
+        """Ключ ответа: версия справочников и параметры запроса.
+
+        При refresh=False используется только копия версии в процессе;
+        если она устарела, возвращается None.
+        """
+        version = (
+            catalog_version.get() if refresh else catalog_version.local()
+        )
+        if version is None:
+            return None
+        return (
+            self.basename,
+            version,
+            tuple(sorted(
+                (name, tuple(values))
+                for name, values in self.request.query_params.lists()
+            )),
+        )
+
+    def get_list_data(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+        key = self.get_cache_key()
+        response = cached_response(request, key)
+        if response is None:
+            variants = encode_variants(JSONRenderer().render(
+                self.get_list_data(request, *args, **kwargs)
+            ))
+            catalog_cache.set(key, variants)
+            response = cached_response(request, key, variants)
+        return response
@@ -0,0 +1,55 @@
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import serializers
+
+from .timing import timed
+from recipes.derivatives import get_urls
+
+# Параметр запроса, включающий в ответ адреса уменьшенных копий картинок.
+DERIVATIVES_PARAM = "image_derivatives"
+
+
+class Base64ImageField(serializers.ImageField):
+    """Картинка строкой base64 или загруженным файлом (multipart).
+
+    Строка декодируется полем drf_extra_fields, которое (вместе с Pillow
+    и определением типа файла) загружается при первой загрузке картинки,
+    а не при старте процесса. Замеряет время декодирования изображения.
+    """
+
+    decoder = None
+
+    def to_internal_value(self, data):
+        with timed("image"):
+            if isinstance(data, UploadedFile):
+                return super().to_internal_value(data)
+            if self.decoder is None:
+                from drf_extra_fields.fields import Base64ImageField
+                self.decoder = Base64ImageField(**self._kwargs)
+            return self.decoder.to_internal_value(data)
+
+
+class ImageDerivativesField(serializers.Field):
+    """Адреса уменьшенных копий картинки: ``{ширина: {формат: url}}``."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_urls(value, self.context.get("request"))
+
+
+class OptionalDerivativesMixin:
+    """Выводит поля ImageDerivativesField только по параметру запроса
+    ``?image_derivatives=1``: схема ответов API без него не меняется."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.query_params.get(
+            DERIVATIVES_PARAM
+        ) not in ("1", "true"):
+            for name, field in list(fields.items()):
+                if isinstance(field, ImageDerivativesField):
+                    del fields[name]
+        return fields
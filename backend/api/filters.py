@@ -1,25 +1,54 @@
 from django_filters.rest_framework import (ModelMultipleChoiceFilter,
                                            BooleanFilter, CharFilter,
-                                           FilterSet, ModelChoiceFilter)
+                                           ChoiceFilter, FilterSet,
+                                           ModelChoiceFilter)
 
 from recipes.models import Ingredient, Recipe, Tag, User
+from recipes.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр для рецептов по тегам и автору."""
+    """Фильтр для рецептов по тегам, автору и полнотекстовому поиску."""
 
     tags = ModelMultipleChoiceFilter(
-        field_name="tags__slug",
         queryset=Tag.objects.all(),
-        to_field_name="slug"
+        to_field_name="slug",
+        method="filter_tags",
+    )
+    # any - рецепты хотя бы с одним из тегов, all - со всеми тегами.
+    tags_match = ChoiceFilter(
+        choices=(("any", "any"), ("all", "all")),
+        method="filter_tags_match",
     )
     author = ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = BooleanFilter(method="filter_is_in_shopping_cart")
+    search = CharFilter(method="filter_search")
+    # Применяется последним и заменяет сортировку по релевантности поиска.
+    ordering = ChoiceFilter(
+        choices=(("trending", "trending"),), method="filter_ordering"
+    )
 
     class Meta:
         model = Recipe
-        fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "tags",
+            "tags_match",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+            "ordering",
+        )
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.with_tags(
+            value, match_all=self.form.cleaned_data.get("tags_match") == "all"
+        )
+
+    def filter_tags_match(self, queryset, name, value):
+        # Учитывается в filter_tags.
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -31,6 +60,13 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        # Популярные за последнее время (см. recipes.trending).
+        return queryset.order_by("-trending_score", "-id")
+
 
 class IngredientFilter(FilterSet):
     """Фильтр для ингредиентов."""
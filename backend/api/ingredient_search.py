@@ -0,0 +1,159 @@
+"""Поиск ингредиентов по индексу в памяти процесса.
+
+Справочник ингредиентов небольшой (около двух тысяч строк) и меняется
+редко, поэтому каждый процесс держит его копию:
+
+* отсортированный список названий - поиск по началу через ``bisect``;
+* таблица триграмм - поиск подстроки без перебора всего справочника;
+* число рецептов с ингредиентом - сортировка результатов по популярности.
+
+Индекс перестраивается, когда меняется версия справочников
+(``recipes.catalog``) или истекает ``INGREDIENT_INDEX_TTL``.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count
+
+from recipes.catalog import get_catalog_version
+from recipes.models import Ingredient, RecipeIngredient
+
+NGRAM_SIZE = 3
+# Символ больше любого символа названия: граница диапазона префикса.
+PREFIX_END = "\U0010ffff"
+
+
+def normalize(text):
+    return text.strip().casefold()
+
+
+def ngrams(text):
+    return {
+        text[start:start + NGRAM_SIZE]
+        for start in range(len(text) - NGRAM_SIZE + 1)
+    }
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов одного процесса.
+
+    Все структуры индекса заменяются одним присваиванием ``self.snapshot``,
+    поэтому поиск в других потоках не видит недостроенный индекс.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def build(self):
+        """Загружает справочник и популярность из базы."""
+        version = get_catalog_version()
+        ingredients = list(
+            Ingredient.objects.values("id", "name", "measurement_unit")
+        )
+        folded = [normalize(ingredient["name"]) for ingredient in ingredients]
+        keys = sorted(zip(folded, range(len(folded))))
+        ngram_table = defaultdict(list)
+        for position, name in enumerate(folded):
+            for ngram in ngrams(name):
+                ngram_table[ngram].append(position)
+        self.snapshot = {
+            "version": version,
+            "built_at": time.monotonic(),
+            "ingredients": ingredients,
+            "folded": folded,
+            "names": [name for name, _ in keys],
+            "positions": [position for _, position in keys],
+            "ngram_table": {
+                ngram: frozenset(positions)
+                for ngram, positions in ngram_table.items()
+            },
+            "popularity": dict(
+                RecipeIngredient.objects.order_by()
+                .values_list("ingredient")
+                .annotate(total=Count("id"))
+            ),
+        }
+
+    def warm(self):
+        """Строит индекс при старте процесса, если база уже доступна."""
+        try:
+            self.build()
+        except DatabaseError:
+            self.snapshot = None
+
+    def is_stale(self):
+        if self.snapshot is None:
+            return True
+        ttl = settings.INGREDIENT_INDEX_TTL if self.ttl is None else self.ttl
+        return (
+            self.snapshot["version"] != get_catalog_version()
+            or time.monotonic() - self.snapshot["built_at"] > ttl
+        )
+
+    def get_snapshot(self):
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self.build()
+        return self.snapshot
+
+    def search(self, query, substring=True):
+        """Ингредиенты, подходящие под запрос, лучшие первыми.
+
+        Сначала идут совпадения по началу названия, затем (если
+        substring) совпадения по подстроке; внутри каждой группы -
+        по убыванию числа рецептов с ингредиентом, затем по названию.
+        """
+        snapshot = self.get_snapshot()
+        query = normalize(query)
+        if not query:
+            return list(snapshot["ingredients"])
+        start = bisect_left(snapshot["names"], query)
+        end = bisect_right(snapshot["names"], query + PREFIX_END, lo=start)
+        prefix = snapshot["positions"][start:end]
+        results = self.rank(snapshot, prefix)
+        if substring:
+            found = set(prefix)
+            results += self.rank(snapshot, (
+                position
+                for position in self.find_substring(snapshot, query)
+                if position not in found
+            ))
+        return results
+
+    @staticmethod
+    def find_substring(snapshot, query):
+        ngram_set = ngrams(query)
+        if ngram_set:
+            candidates = frozenset.intersection(*(
+                snapshot["ngram_table"].get(ngram, frozenset())
+                for ngram in ngram_set
+            ))
+        else:
+            # Запрос короче n-граммы: справочник достаточно мал для
+            # прямого перебора.
+            candidates = range(len(snapshot["folded"]))
+        return [
+            position for position in candidates
+            if query in snapshot["folded"][position]
+        ]
+
+    @staticmethod
+    def rank(snapshot, positions):
+        popularity = snapshot["popularity"]
+        ingredients = [
+            snapshot["ingredients"][position] for position in positions
+        ]
+        ingredients.sort(key=lambda ingredient: (
+            -popularity.get(ingredient["id"], 0), ingredient["name"]
+        ))
+        return ingredients
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,354 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+from base64 import b64encode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import baseconv, timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.management.commands.generate_fake_data import (IMAGE, PASSWORD,
+                                                            USERNAME_PREFIX)
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import User
+
+SIGNUP_PREFIX = "bench_signup_"
+IMAGE_DATA = "data:image/png;base64," + b64encode(IMAGE).decode()
+
+# Маршруты API в порядке выполнения за одну итерацию. Пишущие запросы
+# идут парами (добавление и отмена), поэтому данные после прогона не
+# меняются. "auth": None - токен основного пользователя, "anon" - без
+# токена, "login" - токен, полученный шагом auth-login.
+STEPS = (
+    ("users-list", "get", "/api/users/", None, None),
+    ("users-detail", "get", "/api/users/{author}/", None, None),
+    ("users-me", "get", "/api/users/me/", None, None),
+    ("users-subscriptions", "get",
+     "/api/users/subscriptions/?recipes_limit=3", None, None),
+    ("users-subscribe", "post", "/api/users/{author}/subscribe/", None, None),
+    ("users-unsubscribe", "delete", "/api/users/{author}/subscribe/",
+     None, None),
+    ("users-avatar-put", "put", "/api/users/me/avatar/",
+     {"avatar": IMAGE_DATA}, None),
+    ("users-avatar-delete", "delete", "/api/users/me/avatar/", None, None),
+    ("users-set-password", "post", "/api/users/set_password/",
+     {"current_password": PASSWORD, "new_password": PASSWORD + "x"}, None),
+    ("users-set-password-back", "post", "/api/users/set_password/",
+     {"current_password": PASSWORD + "x", "new_password": PASSWORD}, None),
+    ("users-create", "post", "/api/users/", {
+        "email": SIGNUP_PREFIX + "{iteration}@bench.foodgram.local",
+        "username": SIGNUP_PREFIX + "{iteration}",
+        "first_name": "Тест",
+        "last_name": "Тестов",
+        "password": PASSWORD,
+    }, "anon"),
+    ("auth-login", "post", "/api/auth/token/login/",
+     {"email": "{login_email}", "password": PASSWORD}, "anon"),
+    ("auth-logout", "post", "/api/auth/token/logout/", None, "login"),
+    ("tags-list", "get", "/api/tags/", None, "anon"),
+    ("tags-detail", "get", "/api/tags/{tag}/", None, "anon"),
+    ("ingredients-list", "get", "/api/ingredients/", None, "anon"),
+    ("ingredients-search", "get", "/api/ingredients/?name={prefix}",
+     None, "anon"),
+    ("ingredients-detail", "get", "/api/ingredients/{ingredient}/",
+     None, "anon"),
+    ("recipes-list-anon", "get", "/api/recipes/", None, "anon"),
+    ("recipes-list", "get", "/api/recipes/", None, None),
+    ("recipes-list-deep", "get", "/api/recipes/?page={last_page}",
+     None, None),
+    ("recipes-list-cursor", "get", "/api/recipes/?cursor=", None, None),
+    ("recipes-filter-tags", "get", "/api/recipes/?tags={tag_slug}",
+     None, None),
+    ("recipes-filter-favorited", "get", "/api/recipes/?is_favorited=1",
+     None, None),
+    ("recipes-filter-cart", "get", "/api/recipes/?is_in_shopping_cart=1",
+     None, None),
+    ("recipes-trending", "get", "/api/recipes/?ordering=trending",
+     None, None),
+    ("recipes-trending-cursor", "get",
+     "/api/recipes/?ordering=trending&cursor=", None, None),
+    ("recipes-feed", "get", "/api/recipes/feed/", None, None),
+    ("recipes-feed-cursor", "get", "/api/recipes/feed/?cursor=", None, None),
+    ("recipes-detail", "get", "/api/recipes/{recipe}/", None, None),
+    ("recipes-similar", "get", "/api/recipes/{recipe}/similar/", None, None),
+    ("recipes-create", "post", "/api/recipes/", {
+        "name": "Тестовый рецепт",
+        "text": "Описание тестового рецепта",
+        "image": IMAGE_DATA,
+        "cooking_time": 10,
+        "tags": ["{tag}"],
+        "ingredients": [{"id": "{ingredient}", "amount": 10}],
+    }, None),
+    ("recipes-update", "patch", "/api/recipes/{created}/", {
+        "name": "Измененный рецепт",
+        "tags": ["{tag}"],
+        "ingredients": [{"id": "{ingredient}", "amount": 20}],
+    }, None),
+    ("recipes-delete", "delete", "/api/recipes/{created}/", None, None),
+    ("recipes-favorite", "post", "/api/recipes/{recipe}/favorite/",
+     None, None),
+    ("recipes-unfavorite", "delete", "/api/recipes/{recipe}/favorite/",
+     None, None),
+    ("recipes-favorite-bulk", "post", "/api/recipes/favorite/",
+     {"recipes": "{bulk}"}, None),
+    ("recipes-unfavorite-bulk", "delete", "/api/recipes/favorite/",
+     {"recipes": "{bulk}"}, None),
+    ("recipes-cart-add", "post", "/api/recipes/{recipe}/shopping_cart/",
+     None, None),
+    ("recipes-cart-remove", "delete",
+     "/api/recipes/{recipe}/shopping_cart/", None, None),
+    ("recipes-download-txt", "get",
+     "/api/recipes/download_shopping_cart/", None, None),
+    ("recipes-download-csv", "get",
+     "/api/recipes/download_shopping_cart/?format=csv", None, None),
+    ("recipes-download-pdf", "get",
+     "/api/recipes/download_shopping_cart/?format=pdf", None, None),
+    ("recipes-get-link", "get", "/api/recipes/{recipe}/get-link/",
+     None, "anon"),
+    ("short-link", "get", "/s/{short}/", None, "anon"),
+)
+
+
+def fill(value, context):
+    """Подставляет значения контекста в строки шаблона шага."""
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value.count(
+            "{"
+        ) == 1:
+            return context[value[1:-1]]
+        return value.format(**context)
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    return value
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"),
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет все маршруты API на данных generate_fake_data и "
+        "сохраняет отчет: p50/p95 времени ответа, число запросов к базе "
+        "и размер ответа. С --compare сравнивает с прошлым отчетом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare", help="Путь к отчету, с которым сравнить результат."
+        )
+        parser.add_argument(
+            "--only", help="Выполнить только маршруты, содержащие строку."
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Завершиться с ошибкой, если p95 вырос больше чем на N %%.",
+        )
+
+    def handle(self, *args, **options):
+        context = self.get_context()
+        steps = [
+            step for step in STEPS
+            if not options["only"] or options["only"] in step[0]
+        ]
+        client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0].strip())
+        results = {name: [] for name, *_ in steps}
+        try:
+            for iteration in range(options["warmup"] + options["iterations"]):
+                context["iteration"] = iteration
+                for name, *step in steps:
+                    sample = self.run_step(client, context, *step)
+                    if iteration >= options["warmup"]:
+                        results[name].append(sample)
+        finally:
+            User.objects.filter(username__startswith=SIGNUP_PREFIX).delete()
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "created": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "users": User.objects.count(),
+                "recipes": Recipe.objects.count(),
+                "ingredients": Ingredient.objects.count(),
+            },
+            "routes": {
+                name: self.summarize(samples)
+                for name, samples in results.items()
+            },
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report)
+        if options["compare"]:
+            self.compare(report, options["compare"], options["max_regression"])
+
+    def get_context(self):
+        users = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by("pk")
+        if users.count() < 3:
+            raise CommandError(
+                "Нет тестовых данных, сначала выполните generate_fake_data."
+            )
+        user, login_user = users[0], users[1]
+        author = users.exclude(pk=user.pk).exclude(
+            subscribers__user=user
+        ).first()
+        recipe = Recipe.objects.exclude(
+            pk__in=Favorite.objects.filter(user=user).values("recipe")
+        ).exclude(
+            pk__in=ShoppingCart.objects.filter(user=user).values("recipe")
+        ).order_by("pk").first()
+        bulk = list(Recipe.objects.exclude(
+            pk__in=Favorite.objects.filter(user=user).values("recipe")
+        ).order_by("-pk").values_list("pk", flat=True)[:10])
+        if author is None or recipe is None:
+            raise CommandError(
+                "Недостаточно данных для пар запросов, увеличьте объем "
+                "generate_fake_data."
+            )
+        tag = Tag.objects.order_by("pk").first()
+        ingredient = Ingredient.objects.order_by("pk").first()
+        token, _ = Token.objects.get_or_create(user=user)
+        return {
+            "token": token.key,
+            "login_email": login_user.email,
+            "author": author.pk,
+            "recipe": recipe.pk,
+            "bulk": bulk,
+            "short": baseconv.base64.encode(str(recipe.pk)),
+            "tag": tag.pk,
+            "tag_slug": tag.slug,
+            "ingredient": ingredient.pk,
+            "prefix": ingredient.name[:2],
+            "last_page": max(
+                math.ceil(
+                    Recipe.objects.count() / settings.REST_FRAMEWORK.get(
+                        "PAGE_SIZE", 6
+                    )
+                ),
+                1,
+            ),
+        }
+
+    def run_step(self, client, context, method, path, data, auth):
+        headers = {}
+        if auth is None:
+            headers["HTTP_AUTHORIZATION"] = f"Token {context['token']}"
+        elif auth == "login":
+            headers["HTTP_AUTHORIZATION"] = f"Token {context['login']}"
+        path = fill(path, context)
+        if data is not None:
+            data = fill(data, context)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(
+                path, data, format="json", **headers
+            )
+            if response.streaming:
+                content = b"".join(response.streaming_content)
+            else:
+                content = response.content
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise CommandError(
+                f"{method.upper()} {path}: {response.status_code} "
+                f"{content[:200]!r}"
+            )
+        if path.endswith("/token/login/"):
+            context["login"] = response.json()["auth_token"]
+        elif method == "post" and path == "/api/recipes/":
+            context["created"] = response.json()["id"]
+        return {
+            "method": method.upper(),
+            "path": path,
+            "status": response.status_code,
+            "time": elapsed,
+            "queries": len(queries),
+            "bytes": len(content),
+        }
+
+    def summarize(self, samples):
+        times = [sample["time"] * 1000 for sample in samples]
+        last = samples[-1]
+        return {
+            "method": last["method"],
+            "path": last["path"],
+            "status": last["status"],
+            "p50_ms": round(percentile(times, 0.5), 3),
+            "p95_ms": round(percentile(times, 0.95), 3),
+            "mean_ms": round(statistics.mean(times), 3),
+            "queries": max(sample["queries"] for sample in samples),
+            "bytes": last["bytes"],
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'маршрут':32} {'p50, мс':>10} {'p95, мс':>10} "
+            f"{'запросы':>8} {'байты':>10}"
+        )
+        for name, route in report["routes"].items():
+            self.stdout.write(
+                f"{name:32} {route['p50_ms']:10.2f} {route['p95_ms']:10.2f} "
+                f"{route['queries']:8} {route['bytes']:10}"
+            )
+
+    def compare(self, report, path, max_regression):
+        with open(path, encoding="utf-8") as file:
+            baseline = json.load(file)["routes"]
+        self.stdout.write(
+            f"\nСравнение с {path}:\n{'маршрут':32} {'p50':>18} "
+            f"{'p95':>18} {'запросы':>10}"
+        )
+        regressions = []
+        for name, route in report["routes"].items():
+            old = baseline.get(name)
+            if old is None:
+                self.stdout.write(f"{name:32} (нет в базовом отчете)")
+                continue
+            changes = {
+                key: (route[key] - old[key]) / old[key] * 100
+                if old[key] else 0
+                for key in ("p50_ms", "p95_ms")
+            }
+            self.stdout.write(
+                f"{name:32} {changes['p50_ms']:+17.1f}% "
+                f"{changes['p95_ms']:+17.1f}% "
+                f"{old['queries']:>4} -> {route['queries']:<4}"
+            )
+            if max_regression is not None and (
+                changes["p95_ms"] > max_regression
+                or route["queries"] > old["queries"]
+            ):
+                regressions.append(name)
+        if regressions:
+            raise CommandError(
+                "Регрессия производительности: " + ", ".join(regressions)
+            )
@@ -0,0 +1,126 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: импорт модуля (как при старте
+# воркера) и замер времени и памяти процесса.
+SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "startup_ms": (time.perf_counter() - start) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": sorted(sys.modules),
+}}))
+"""
+IMPORT_TIME_PREFIX = "import time:"
+
+
+def parse_import_times(output):
+    """(модуль, собственное время, время с вложенными импортами) в мкс."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        own, total, name = line[len(IMPORT_TIME_PREFIX):].split("|")
+        if not own.strip().isdigit():
+            continue  # Заголовок.
+        rows.append((name.strip(), int(own), int(total)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Время импорта модулей при старте процесса (python -X importtime): "
+        "общее время и память, самые долгие пакеты и модули."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            default="foodgram.wsgi",
+            help="Импортируемый модуль (по умолчанию foodgram.wsgi).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Число запусков, выводится медиана (по умолчанию 3).",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Сколько пакетов и модулей вывести (по умолчанию 15).",
+        )
+        parser.add_argument(
+            "--check",
+            nargs="*",
+            default=("PIL", "drf_extra_fields", "numpy", "scipy",
+                     "reportlab"),
+            help="Модули, которые не должны загружаться при старте.",
+        )
+
+    def handle(self, *args, **options):
+        runs = [self.run(options["module"]) for _ in range(options["repeat"])]
+        summary, import_times = runs[len(runs) // 2]
+        self.stdout.write(
+            "Старт: {:.0f} мс (медиана {} запусков), память: {:.1f} МБ, "
+            "модулей: {}".format(
+                statistics.median(run["startup_ms"] for run, _ in runs),
+                len(runs),
+                statistics.median(run["rss_mb"] for run, _ in runs),
+                len(summary["modules"]),
+            )
+        )
+        packages = defaultdict(int)
+        for name, own, total in import_times:
+            packages[name.split(".")[0]] += own
+        self.write_top(
+            "Пакеты (собственное время модулей)", packages.items(),
+            options["top"],
+        )
+        self.write_top(
+            "Модули (с вложенными импортами)",
+            ((name, total) for name, own, total in import_times),
+            options["top"],
+        )
+        loaded = set(summary["modules"])
+        for name in options["check"]:
+            if name in loaded:
+                self.stdout.write(self.style.WARNING(
+                    f"{name} загружается при старте"
+                ))
+
+    def run(self, module):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, (str(settings.BASE_DIR), env.get("PYTHONPATH")))
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c",
+             SCRIPT.format(module=module)],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return (
+            json.loads(result.stdout.strip().splitlines()[-1]),
+            parse_import_times(result.stderr),
+        )
+
+    def write_top(self, title, items, count):
+        self.stdout.write(f"\n{title}:")
+        for name, microseconds in sorted(
+            items, key=lambda item: item[1], reverse=True
+        )[:count]:
+            self.stdout.write(f"{microseconds / 1000:9.1f} мс  {name}")
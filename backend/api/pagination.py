@@ -1,8 +1,188 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import FloatField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+CURSOR_SEPARATOR = "|"
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = "limit"
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (курсору) без OFFSET и COUNT(*).
+
+    Курсор хранит значения полей сортировки последнего рецепта страницы,
+    следующая страница выбирается условием
+    ``(creation_date, id) < (последняя дата, последний id)``
+    (или ``(trending_score, id) < ...``, а для поиска -
+    ``(search_rank, creation_date, id) < ...``), поэтому время ответа не
+    зависит от глубины страницы.
+    """
+
+    page_size = PAGE_SIZE
+    max_page_size = MAX_PAGE_SIZE
+    page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    # Сортировки с индексом; сортировка запроса, не входящая в список,
+    # заменяется первой.
+    orderings = (
+        ("-creation_date", "-id"),
+        ("-trending_score", "-id"),
+        ("-search_rank", "-creation_date", "-id"),
+    )
+    # Поля сортировки, которые вычисляются в запросе (annotate).
+    annotated_fields = {
+        "search_rank": FloatField(),
+    }
+    invalid_cursor_message = "Недопустимый курсор."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = self.after(queryset, position)
+        # Один лишний объект показывает, есть ли следующая страница.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ("next", self.get_next_link()),
+            ("results", data),
+        )))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by)
+        if ordering in self.orderings:
+            return ordering
+        return self.orderings[0]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = [
+            str(getattr(last, field.lstrip("-"))) for field in self.ordering
+        ]
+        cursor = base64.urlsafe_b64encode(
+            CURSOR_SEPARATOR.join(values).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request, model):
+        """Возвращает значения полей сортировки из курсора или None."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = base64.urlsafe_b64decode(
+                encoded.encode()
+            ).decode().split(CURSOR_SEPARATOR)
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.get_field(model, field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, model, name):
+        if name in self.annotated_fields:
+            return self.annotated_fields[name]
+        return model._meta.get_field(name)
+
+    def after(self, queryset, position):
+        """Объекты после позиции курсора."""
+        return queryset.filter(self.get_position_filter(position))
+
+    def get_position_filter(self, position):
+        """Строит условие «после позиции» для составного ключа сортировки."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class RecipePagination(LimitPagePagination):
+    """Пагинация рецептов.
+
+    По умолчанию работает постранично (``page``/``limit``), с параметром
+    ``cursor`` (пустым для первой страницы) переключается на
+    ``KeysetPagination``.
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedKeysetPagination(KeysetPagination):
+    """Пагинация по ключу для ленты подписок (recipes.feed.Timeline)."""
+
+    orderings = (("-creation_date", "-id"),)
+
+    def get_ordering(self, timeline):
+        return self.orderings[0]
+
+    def after(self, timeline, position):
+        return timeline.after(position)
+
+
+class FeedPagination(RecipePagination):
+    keyset_pagination_class = FeedKeysetPagination
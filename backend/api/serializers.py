@@ -1,12 +1,20 @@
+import json
+
 from django.core.validators import MinValueValidator
 from django.db import transaction
 from django.forms import ValidationError
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, validators
 from rest_framework.validators import UniqueValidator
 
+from .fields import (Base64ImageField, ImageDerivativesField,
+                     OptionalDerivativesMixin)
+from .timing import TimedSerializerMixin
 from recipes.constants import MIN_COOKING_TIME, MIN_INGEDIENT_AMOUNT
+from recipes.counters import shift_counters
+from recipes.feed import fan_out
+from recipes.search import update_search_index
+from recipes.shopping_cart import cart_users, change_totals
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from users.constants import (MAX_EMAIL_LENGTH, MAX_NAME_LENGTH,
@@ -15,7 +23,20 @@ from users.models import Subscription, User
 from users.validators import username_validator
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+# Наибольшее число рецептов в одном массовом запросе.
+MAX_BULK_RECIPES = 100
+
+
+def parse_json_field(name, value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise serializers.ValidationError(
+            {name: "Ожидается список в формате JSON."}
+        )
+
+
+class CustomUserCreateSerializer(TimedSerializerMixin, UserCreateSerializer):
     """Сериализатор для регистрации пользователей."""
 
     email = serializers.EmailField(
@@ -47,7 +68,9 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(
+    TimedSerializerMixin, OptionalDerivativesMixin, UserSerializer
+):
     """Сериализатор для пользователей (модель User)."""
 
     username = serializers.CharField(
@@ -57,6 +80,7 @@ class CustomUserSerializer(UserSerializer):
     )
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     avatar = Base64ImageField(required=False, allow_null=True)
+    avatar_derivatives = ImageDerivativesField()
 
     class Meta:
         model = User
@@ -68,9 +92,12 @@ class CustomUserSerializer(UserSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_derivatives",
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         if request is None:
             return False
@@ -82,7 +109,9 @@ class CustomUserSerializer(UserSerializer):
         )
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для подписчиков (модель Subscription)."""
 
     user = serializers.SlugRelatedField(
@@ -121,7 +150,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         ).data
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для тэгов (модель Tag)."""
 
     class Meta:
@@ -129,7 +158,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "slug")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для ингредиентов (модель Ingredient)."""
 
     class Meta:
@@ -172,15 +201,23 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         fields = ("id", "amount")
 
 
-class ShortInfoRecipeSerializer(serializers.ModelSerializer):
+class ShortInfoRecipeSerializer(
+    TimedSerializerMixin, OptionalDerivativesMixin,
+    serializers.ModelSerializer
+):
     """Сериализатор краткого просмотра рецептов."""
 
+    image_derivatives = ImageDerivativesField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_derivatives", "cooking_time")
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+    TimedSerializerMixin, OptionalDerivativesMixin,
+    serializers.ModelSerializer
+):
     """Сериализатор для рецептов."""
 
     author = CustomUserSerializer(read_only=True)
@@ -193,6 +230,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         default=False, read_only=True
     )
     image = Base64ImageField()
+    image_derivatives = ImageDerivativesField()
 
     class Meta:
         model = Recipe
@@ -205,12 +243,15 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_derivatives",
             "text",
             "cooking_time",
         )
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
+class RecipeCreateUpdateSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для создания и изменения рецептов."""
 
     ingredients = RecipeIngredientCreateSerializer(
@@ -241,6 +282,27 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
 
+    def to_internal_value(self, data):
+        if hasattr(data, "getlist"):
+            data = self.parse_form(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def parse_form(data):
+        """Данные multipart-формы: ингредиенты передаются строкой JSON,
+        теги - повторяющимся полем или строкой JSON."""
+        parsed = {key: data.get(key) for key in data}
+        if "tags" in data:
+            tags = data.getlist("tags")
+            if len(tags) == 1 and tags[0].lstrip().startswith("["):
+                tags = parse_json_field("tags", tags[0])
+            parsed["tags"] = tags
+        if isinstance(parsed.get("ingredients"), str):
+            parsed["ingredients"] = parse_json_field(
+                "ingredients", parsed["ingredients"]
+            )
+        return parsed
+
     def validate(self, value):
         if not value.get("recipe_ingredients"):
             raise serializers.ValidationError("Добавьте хотя бы 1 ингредиент")
@@ -274,21 +336,83 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 author=self.context["request"].user, **validated_data
             )
             self.add_tags_ingredients(recipe, tags, ingredients)
+            shift_counters(
+                User.objects.filter(pk=recipe.author_id), 1, "recipes_count"
+            )
+            fan_out(recipe)
             return recipe
 
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop("recipe_ingredients")
-        tags = validated_data.pop("tags")
+        """Меняет только то, что изменилось: теги и ингредиенты, не
+        переданные в запросе, не трогаются."""
+        ingredients = validated_data.pop("recipe_ingredients", None)
+        tags = validated_data.pop("tags", None)
         with transaction.atomic():
-            instance.ingredients.clear()
-            instance.tags.clear()
-            self.add_tags_ingredients(instance, tags, ingredients)
             super().update(instance, validated_data)
+            if tags is not None:
+                self.set_tags(instance, tags)
+            if ingredients is not None:
+                self.set_ingredients(instance, ingredients)
+            if ingredients is not None or validated_data.keys() & {
+                "name", "text"
+            }:
+                update_search_index([instance.pk])
             return instance
 
     @staticmethod
-    def add_tags_ingredients(recipe, tags, ingredients):
+    def set_tags(recipe, tags):
+        # set() сам удаляет и добавляет только отличающиеся связи.
         recipe.tags.set(tags)
+        tags_mask = Recipe.get_tags_mask(tags)
+        if tags_mask != recipe.tags_mask:
+            recipe.tags_mask = tags_mask
+            Recipe.objects.filter(pk=recipe.pk).update(tags_mask=tags_mask)
+
+    @staticmethod
+    def set_ingredients(recipe, ingredients):
+        """Приводит ингредиенты рецепта к ingredients тремя массовыми
+        операциями и переносит разницу в суммы списков покупок."""
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient["ingredient"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in current.items()
+        }
+        deltas = {
+            ingredient_id: amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+            for ingredient_id in old_amounts.keys() | amounts.keys()
+        }
+        to_create, to_update = [], []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif item.amount != amount:
+                item.amount = amount
+                to_update.append(item)
+        to_delete = [
+            item.pk
+            for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        ]
+        RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        RecipeIngredient.objects.bulk_update(to_update, ("amount",))
+        RecipeIngredient.objects.bulk_create(to_create)
+        if any(deltas.values()):
+            change_totals(cart_users(recipe.pk), deltas)
+
+    @classmethod
+    def add_tags_ingredients(cls, recipe, tags, ingredients):
+        cls.set_tags(recipe, tags)
         RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
@@ -297,6 +421,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             )
             for ingredient in ingredients
         )
+        update_search_index([recipe.pk])
 
     def to_representation(self, instance):
         return RecipeSerializer(instance, context=self.context).data
@@ -306,9 +431,7 @@ class UserRecipeSerializer(CustomUserSerializer):
     """Сериализатор для рецептов пользователей (модель User)."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        read_only=True, source="recipes.count"
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -322,6 +445,7 @@ class UserRecipeSerializer(CustomUserSerializer):
             "recipes",
             "recipes_count",
             "avatar",
+            "avatar_derivatives",
         )
 
     def get_recipes(self, obj):
@@ -337,7 +461,7 @@ class UserRecipeSerializer(CustomUserSerializer):
         return ShortInfoRecipeSerializer(recipes, many=True).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для рецептов в избранном."""
 
     class Meta:
@@ -360,7 +484,9 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ).data
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для рецептов в списке покупок."""
 
     class Meta:
@@ -383,7 +509,17 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ).data
 
 
-class SetPasswordSerializer(serializers.Serializer):
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
+
+
+class SetPasswordSerializer(TimedSerializerMixin, serializers.Serializer):
     """Сериализатор модели User для смены пароля."""
 
     new_password = serializers.CharField(required=True)
@@ -0,0 +1,109 @@
+"""Выгрузка списка покупок в разных форматах.
+
+Каждый формат - генератор частей ответа по потоку строк
+``(название, единица измерения, количество)``. Текстовые форматы отдают
+заголовок до выполнения запроса и не держат весь список в памяти.
+PDF собирается целиком (формат требует таблицу смещений в конце файла)
+во временный файл, который при большом размере сбрасывается на диск.
+"""
+import csv
+import json
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+TITLE = "Список покупок"
+CHUNK_SIZE = 64 * 1024
+PDF_MEMORY_LIMIT = 1024 * 1024
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_FALLBACK_FONT = "Helvetica"
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class Echo:
+    """Объект-файл, который возвращает записанную строку (для csv)."""
+
+    def write(self, value):
+        return value
+
+
+def format_line(name, unit, amount):
+    return f"{name} - {amount} ({unit})"
+
+
+def render_txt(rows):
+    yield f"{TITLE}\n"
+    for row in rows:
+        yield format_line(*row) + "\n"
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("Ингредиент", "Единица измерения", "Количество"))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_json(rows):
+    yield "["
+    separator = ""
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {"name": name, "measurement_unit": unit, "amount": amount},
+            ensure_ascii=False,
+        )
+        separator = ","
+    yield "]"
+
+
+def get_pdf_font():
+    """Шрифт с кириллицей из настроек или встроенный Helvetica."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    if font_path and os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+    return PDF_FALLBACK_FONT
+
+
+def render_pdf(rows):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    font = get_pdf_font()
+    with SpooledTemporaryFile(max_size=PDF_MEMORY_LIMIT) as buffer:
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        y = height - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE + 4)
+        pdf.drawString(PDF_MARGIN, y, TITLE)
+        pdf.setFont(font, PDF_FONT_SIZE)
+        for row in rows:
+            y -= PDF_LINE_HEIGHT
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, format_line(*row))
+        pdf.save()
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+FORMATS = {
+    "txt": render_txt,
+    "csv": render_csv,
+    "json": render_json,
+    "pdf": render_pdf,
+}
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from users.models import User
+
+
+def invalidate_user(user_id):
+    token_cache.invalidate_user(user_id)
+    # Повторно после фиксации: запрос, прочитавший из базы старую версию
+    # пользователя до фиксации, не должен оставить ее в кэше.
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
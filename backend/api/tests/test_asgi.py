@@ -0,0 +1,180 @@
+import asyncio
+import re
+from unittest import mock
+
+from asgiref.testing import ApplicationCommunicator
+from django.http import StreamingHttpResponse
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from api.async_views import (STREAM_QUEUE_SIZE, ASGIHandler, async_patterns,
+                             stream_in_pool)
+from api.authentication import token_cache
+from api.catalog_cache import catalog_cache
+from recipes.models import Ingredient, Tag
+from recipes.tests.base import make_recipe, make_user
+
+
+def async_urlconf():
+    """Маршруты API с асинхронными представлениями, как под ASGI."""
+    from api.urls import router
+
+    class urlconf:
+        urlpatterns = [
+            path("api/", include(async_patterns(router.urls))),
+        ]
+    return urlconf
+
+
+class ASGITestCase(TransactionTestCase):
+    """Запросы через ASGIHandler проекта к маршрутам с асинхронными
+    представлениями."""
+
+    async def get(self, path, query_string="", headers=()):
+        with override_settings(ROOT_URLCONF=async_urlconf()):
+            return await self.asgi_get(path, query_string, headers)
+
+    async def asgi_get(self, path, query_string="", headers=()):
+        communicator = ApplicationCommunicator(ASGIHandler(), {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query_string.encode(),
+            "headers": [(b"host", b"testserver"), *headers],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        })
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output(5)
+        body = b""
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await communicator.wait(5)
+        headers = {
+            name.decode().lower(): value.decode()
+            for name, value in start["headers"]
+        }
+        return start["status"], headers, body
+
+
+@override_settings(
+    ASYNC_VIEWS=True,
+    SERVER_TIMING_ENABLED=True,
+    SERVER_TIMING_SAMPLE_RATE=1,
+)
+class ShoppingCartDownloadASGITests(ASGITestCase):
+    """Выгрузка списка покупок: тело ответа приходит целиком, а запросы
+    потока пула попадают в Server-Timing."""
+
+    def setUp(self):
+        self.user = make_user("reader")
+        self.token = Token.objects.create(user=self.user)
+        salt = Ingredient.objects.create(name="соль", measurement_unit="г")
+        flour = Ingredient.objects.create(name="мука", measurement_unit="г")
+        for amount in (1, 2):
+            recipe = make_recipe(
+                self.user, ((salt, amount), (flour, 10 * amount))
+            )
+            response = self.client.post(
+                f"/api/recipes/{recipe.pk}/shopping_cart/",
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+
+    async def download(self, file_format):
+        return await self.get(
+            "/api/recipes/download_shopping_cart/",
+            f"format={file_format}",
+            [(b"authorization", f"Token {self.token.key}".encode())],
+        )
+
+    async def test_txt_body_is_complete(self):
+        status, headers, body = await self.download("txt")
+        self.assertEqual(status, 200, body)
+        text = body.decode()
+        self.assertIn("мука", text)
+        self.assertIn("30", text)
+        self.assertIn("соль", text)
+        self.assertIn("3", text)
+
+    async def test_pdf_body_is_complete(self):
+        status, headers, body = await self.download("pdf")
+        self.assertEqual(status, 200, body)
+        self.assertTrue(body.startswith(b"%PDF"))
+        self.assertIn(b"%%EOF", body[-32:])
+
+    async def test_server_timing_counts_pool_queries(self):
+        # Список читается уже при отправке тела, до заголовков в потоке
+        # пула выполняется только поиск токена.
+        token_cache.clear()
+        status, headers, body = await self.download("txt")
+        self.assertEqual(status, 200, body)
+        match = re.search(
+            r'db;dur=[\d.]+;desc="(\d+) queries"',
+            headers["server-timing"],
+        )
+        self.assertIsNotNone(match, headers["server-timing"])
+        self.assertGreater(int(match.group(1)), 0)
+
+
+@override_settings(ASYNC_VIEWS=True)
+class CatalogASGITests(ASGITestCase):
+    """Попадание в кэш ответов справочника отдается в цикле событий."""
+
+    def setUp(self):
+        catalog_cache.clear()
+        Tag.objects.create(name="Завтрак", slug="breakfast")
+
+    async def test_not_modified_in_event_loop(self):
+        status, headers, body = await self.get("/api/tags/")
+        self.assertEqual(status, 200, body)
+        with mock.patch("api.async_views.run_sync") as run_sync:
+            status, _, _ = await self.get(
+                "/api/tags/",
+                headers=[(b"if-none-match", headers["etag"].encode())],
+            )
+        self.assertEqual(status, 304)
+        run_sync.assert_not_called()
+
+
+class StreamInPoolTests(SimpleTestCase):
+    """Части потокового ответа строятся по мере отправки."""
+
+    def response(self):
+        self.produced = []
+        self.closed = False
+
+        def parts():
+            try:
+                for number in range(100):
+                    self.produced.append(number)
+                    yield f"{number}\n"
+            finally:
+                self.closed = True
+        return StreamingHttpResponse(parts())
+
+    async def test_parts_are_built_on_demand(self):
+        parts = stream_in_pool(self.response())
+        first = await parts.__anext__()
+        await asyncio.sleep(0.1)
+        self.assertLessEqual(len(self.produced), STREAM_QUEUE_SIZE + 2)
+        rest = [part async for part in parts]
+        self.assertEqual(b"".join([first, *rest]).count(b"\n"), 100)
+        self.assertTrue(self.closed)
+
+    async def test_stopped_stream_is_closed(self):
+        parts = stream_in_pool(self.response())
+        await parts.__anext__()
+        await parts.aclose()
+        self.assertTrue(self.closed)
+        self.assertLess(len(self.produced), 100)
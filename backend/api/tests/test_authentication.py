@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.authentication import (FIELDS, CachedTokenAuthentication,
+                                TokenCache, snapshot, token_cache)
+from recipes.tests.base import make_user
+
+
+class TokenCacheTests(TestCase):
+    """Снимок пользователя в памяти процесса."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = make_user("reader")
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def me(self):
+        return self.client.get("/api/users/me/", **self.auth)
+
+    def authenticate(self):
+        return CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+
+    def test_hit_makes_no_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_miss_makes_only_token_query(self):
+        self.authenticate()
+        token_cache.entries.clear()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_snapshot_has_no_password(self):
+        self.assertNotIn("password", FIELDS)
+        self.assertNotIn(self.user.password, snapshot(self.user))
+
+    def test_deactivation_is_seen_by_cached_snapshot(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me().status_code, 401)
+
+
+@override_settings(SHARED_VERSION_TTL=0)
+class TokenRevocationTests(TestCase):
+    """Сброс снимка пользователя в одном процессе виден другим после
+    перечитывания версии сбросов: у каждого процесса свой TokenCache и
+    свой объект бэкенда кэша."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = make_user("reader")
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        self.other = TokenCache()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    @contextmanager
+    def in_other_process(self):
+        alias = settings.AUTH_TOKEN_SHARED_CACHE
+        connections = {alias: caches.create_connection(alias)}
+        with mock.patch("api.authentication.caches", connections), \
+                mock.patch("recipes.versions.caches", connections), \
+                mock.patch("api.signals.token_cache", self.other):
+            yield
+
+    def me(self):
+        return self.client.get("/api/users/me/", **self.auth)
+
+    def test_cache_is_shared(self):
+        self.assertNotIsInstance(
+            caches[settings.AUTH_TOKEN_SHARED_CACHE],
+            (LocMemCache, DummyCache),
+        )
+
+    def test_revocation_in_other_process(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+        with self.in_other_process():
+            self.other.invalidate_user(self.user.pk)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_revocation_is_seen_after_ttl(self):
+        self.assertEqual(self.me().status_code, 200)
+        with override_settings(SHARED_VERSION_TTL=60):
+            token_cache.get(self.token.key)
+            with self.in_other_process():
+                self.other.invalidate_user(self.user.pk)
+            # Версия сбросов перечитывается не чаще раза в TTL.
+            self.assertIsNotNone(token_cache.get(self.token.key))
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_logout_in_other_process(self):
+        self.assertEqual(self.me().status_code, 200)
+        key = self.token.key
+        with self.in_other_process():
+            self.token.delete()
+        # Снимок в этом процессе остается до сверки с меткой сброса.
+        self.assertIn(key, token_cache.entries)
+        self.assertEqual(self.me().status_code, 401)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from recipes.tests.base import make_recipe, make_user
+
+
+@override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=1)
+class FeedTests(TestCase):
+    """Лента сливает сохраненные записи с рецептами авторов, у которых
+    больше FEED_FANOUT_MAX_SUBSCRIBERS подписчиков."""
+
+    client_class = APIClient
+
+    def setUp(self):
+        self.reader = make_user("reader")
+        self.fan = make_user("fan")
+        self.small = make_user("small")
+        self.big = make_user("big")
+        self.other = make_user("other")
+        start = timezone.now() - timedelta(days=1)
+        self.expected = []
+        for number in range(8):
+            author = (self.small, self.big, self.other)[number % 3]
+            recipe = make_recipe(author, name=f"Рецепт {number}")
+            Recipe.objects.filter(pk=recipe.pk).update(
+                creation_date=start + timedelta(minutes=number)
+            )
+            if author != self.other:
+                self.expected.insert(0, recipe.pk)
+        self.subscribe(self.fan, self.big)
+        self.subscribe(self.reader, self.small)
+        self.subscribe(self.reader, self.big)
+
+    def subscribe(self, user, author, method="post"):
+        self.client.force_authenticate(user)
+        response = getattr(self.client, method)(
+            f"/api/users/{author.pk}/subscribe/"
+        )
+        self.assertIn(response.status_code, (201, 204), response.content)
+
+    def feed(self, params=None):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get("/api/recipes/feed/", params or {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, data):
+        return [recipe["id"] for recipe in data["results"]]
+
+    def assertFeed(self):
+        data = self.feed({"limit": 50})
+        self.assertEqual(data["count"], len(self.expected))
+        self.assertEqual(self.ids(data), self.expected)
+        data = self.feed({"limit": 2, "page": 2})
+        self.assertEqual(self.ids(data), self.expected[2:4])
+        seen = []
+        data = self.feed({"cursor": "", "limit": 2})
+        seen += self.ids(data)
+        while data["next"]:
+            response = self.client.get(data["next"])
+            data = response.json()
+            seen += self.ids(data)
+        self.assertEqual(seen, self.expected)
+
+    def test_merges_entries_with_pulled_authors(self):
+        self.assertFalse(FeedEntry.objects.filter(author=self.big).exists())
+        self.assertTrue(FeedEntry.objects.filter(author=self.small).exists())
+        self.assertFeed()
+
+    def test_author_below_threshold_is_backfilled(self):
+        self.subscribe(self.fan, self.big, method="delete")
+        self.assertEqual(
+            FeedEntry.objects.filter(author=self.big, user=self.reader)
+            .count(),
+            len(self.expected) // 2,
+        )
+        self.assertFeed()
+
+    def test_cascade_delete_below_threshold_is_backfilled(self):
+        self.fan.delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(author=self.big, user=self.reader)
+            .exists()
+        )
+        self.assertFeed()
+
+    def test_unsubscribe_removes_author(self):
+        self.subscribe(self.reader, self.small, method="delete")
+        self.expected = [
+            pk for pk in self.expected
+            if Recipe.objects.get(pk=pk).author_id == self.big.pk
+        ]
+        self.assertFeed()
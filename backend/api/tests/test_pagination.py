@@ -0,0 +1,37 @@
+from django.test import TestCase
+
+from recipes.search import update_search_index
+from recipes.tests.base import make_recipe, make_user
+
+
+class SearchKeysetPaginationTests(TestCase):
+    """Курсор сохраняет порядок поиска по релевантности."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = make_user("author")
+        names = (
+            "Суп", "Суп с курицей", "Суп грибной", "Суп", "Борщ",
+            "Суп суп", "Суп", "Рыбный суп с рисом",
+        )
+        recipes = [make_recipe(author, name=name) for name in names]
+        update_search_index([recipe.pk for recipe in recipes])
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    def test_cursor_pages_follow_rank(self):
+        expected = self.ids(self.client.get(
+            "/api/recipes/", {"search": "суп", "limit": 50}
+        ))
+        self.assertEqual(len(expected), 7)
+        seen = []
+        response = self.client.get(
+            "/api/recipes/", {"search": "суп", "cursor": "", "limit": 2}
+        )
+        seen += self.ids(response)
+        while response.json()["next"]:
+            response = self.client.get(response.json()["next"])
+            seen += self.ids(response)
+        self.assertEqual(seen, expected)
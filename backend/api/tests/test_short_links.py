@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.test import TestCase, override_settings
+from django.utils.baseconv import base64
+
+from api.views import short_links_cache
+from recipes.short_links import RecipeIdBitmap, recipe_ids
+from recipes.tests.base import make_recipe, make_user
+
+
+@override_settings(SHARED_VERSION_TTL=0)
+class ShortLinkInvalidationTests(TestCase):
+    """Удаление рецепта в другом процессе сбрасывает карту id и кэш
+    ссылок этого процесса."""
+
+    def setUp(self):
+        short_links_cache.clear()
+        recipe_ids.built_at = None
+        self.recipe = make_recipe(make_user("author"))
+        self.path = f"/s/{base64.encode(str(self.recipe.pk))}/"
+
+    @contextmanager
+    def in_other_process(self):
+        connections = {
+            DEFAULT_CACHE_ALIAS: caches.create_connection(DEFAULT_CACHE_ALIAS)
+        }
+        with mock.patch("recipes.versions.caches", connections), \
+                mock.patch("recipes.signals.recipe_ids", RecipeIdBitmap()):
+            yield
+
+    def test_redirect_max_age_is_short(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(
+            f"max-age={settings.SHORT_LINK_MAX_AGE}",
+            response["Cache-Control"],
+        )
+        self.assertLessEqual(settings.SHORT_LINK_MAX_AGE, 300)
+
+    def test_delete_in_other_process(self):
+        self.assertEqual(self.client.get(self.path).status_code, 302)
+        with self.in_other_process(), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertTrue(recipe_ids.is_stale())
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+
+    def test_link_is_cached_within_generation(self):
+        self.assertEqual(self.client.get(self.path).status_code, 302)
+        with override_settings(SHARED_VERSION_TTL=60):
+            recipe_ids.current()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(self.path).status_code, 302)
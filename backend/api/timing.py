@@ -0,0 +1,172 @@
+"""Замеры времени обработки запроса для заголовка Server-Timing.
+
+Middleware собирает время ожидания соединения из пула, время запросов к
+БД и их число, время представления, сериализаторов, декодирования
+изображений и рендеринга ответа. Замеры
+вложены друг в друга: время сериализатора включает его запросы к БД,
+а total - все остальное. При выключенной настройке middleware не
+подключается, а остальные точки замера сводятся к чтению ContextVar.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.fields import empty
+
+logger = logging.getLogger("foodgram.timing")
+
+current_timings = ContextVar("current_timings", default=None)
+
+# Порядок метрик в заголовке.
+METRICS = ("pool", "db", "view", "serializer", "image", "render", "total")
+
+
+class Timings:
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self.active = set()
+        self.render_start = None
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    @contextmanager
+    def measure(self, name):
+        # Вложенные замеры одной метрики (вложенные сериализаторы)
+        # не суммируются повторно.
+        if name in self.active:
+            yield
+            return
+        self.active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            self.active.discard(name)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка выполнения запросов (connection.execute_wrapper)."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - start)
+            self.queries += 1
+
+    def milliseconds(self):
+        return {
+            name: round(self.durations[name] * 1000, 3)
+            for name in METRICS
+            if name in self.durations
+        }
+
+    def header(self):
+        parts = []
+        for name, duration in self.milliseconds().items():
+            part = f"{name};dur={duration}"
+            if name == "db":
+                part += f';desc="{self.queries} queries"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+@contextmanager
+def timed_queries(timings):
+    """Учитывает в timings запросы соединений текущего потока (у каждого
+    потока свои соединения, поэтому обертка ставится в каждом потоке,
+    выполняющем запросы)."""
+    with ExitStack() as stack:
+        if timings is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+        yield
+
+
+@contextmanager
+def timed(name):
+    """Замер участка кода, если текущий запрос замеряется."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.measure(name):
+        yield
+
+
+class TimedSerializerMixin:
+    """Учитывает время сериализации и валидации в метрике serializer."""
+
+    def to_representation(self, instance):
+        with timed("serializer"):
+            return super().to_representation(instance)
+
+    def run_validation(self, data=empty):
+        with timed("serializer"):
+            return super().run_validation(data)
+
+
+class ServerTimingMiddleware:
+    """Добавляет к ответу заголовок Server-Timing и пишет медленные
+    запросы в лог foodgram.timing.
+
+    Замеряется доля SERVER_TIMING_SAMPLE_RATE запросов.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = Timings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with timed_queries(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        total = time.perf_counter() - start
+        view_end = timings.render_start or start + total
+        timings.add("view", view_end - start)
+        timings.add("total", total)
+        response["Server-Timing"] = timings.header()
+        self.log(request, response, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # Middleware стоит первым и вызывается последним, прямо перед
+        # рендерингом ответа.
+        timings = current_timings.get()
+        if timings is not None:
+            timings.render_start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add(
+                    "render", time.perf_counter() - timings.render_start
+                )
+            )
+        return response
+
+    def log(self, request, response, timings):
+        if not settings.SERVER_TIMING_LOG:
+            return
+        durations = timings.milliseconds()
+        if durations["total"] < settings.SERVER_TIMING_SLOW_MS:
+            return
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": timings.queries,
+            **durations,
+        }))
@@ -0,0 +1,77 @@
+"""Загрузка картинок файлом: multipart/form-data или тело запроса целиком.
+
+Файл пишется потоком во временный файл на диске; загрузка прерывается,
+как только размер файла превысит IMAGE_UPLOAD_MAX_SIZE.
+"""
+import mimetypes
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import FileUploadParser
+
+# Запас на остальные поля формы сверх размера файла.
+FORM_OVERHEAD = 1024 * 1024
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = "upload_too_large"
+
+    def __init__(self):
+        super().__init__(
+            "Размер файла не должен превышать "
+            f"{filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)}."
+        )
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Сохраняет файлы во временные файлы с ограничением размера."""
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > settings.IMAGE_UPLOAD_MAX_SIZE + FORM_OVERHEAD:
+            raise UploadTooLarge()
+        return super().handle_raw_input(
+            input_data, META, content_length, boundary, encoding
+        )
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class UploadLimitMixin:
+    """Подключает LimitedUploadHandler к запросам представления."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class ImageUploadParser(FileUploadParser):
+    """Картинка в теле запроса (Content-Type: image/...).
+
+    Файл доступен в request.data["file"].
+    """
+
+    media_type = "image/*"
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        extension = mimetypes.guess_extension(
+            parser_context["request"].content_type.split(";")[0].strip()
+        )
+        return "upload" + (extension or "")
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import async_patterns
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
 
 router = DefaultRouter()
@@ -14,7 +15,7 @@ router.register("recipes", RecipeViewSet, "recipes")
 
 
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(async_patterns(router.urls))),
     path("auth/", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
 ]
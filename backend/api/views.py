@@ -1,34 +1,82 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef, Sum
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import baseconv
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend  # type: ignore
 from djoser import views as djoser_views  # type: ignore
 from djoser.serializers import SetPasswordSerializer  # type: ignore
 from rest_framework import permissions, status, viewsets  # type: ignore
 from rest_framework.decorators import action  # type: ignore
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny  # type: ignore
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer  # type: ignore
 from rest_framework.response import Response  # type: ignore
 from rest_framework.views import APIView  # type: ignore
 
+from .catalog_cache import CatalogCacheMixin, LRUCache
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPagePagination
+from .ingredient_search import ingredient_index
+from .pagination import (FeedPagination, LimitPagePagination,
+                         RecipePagination)
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (CustomUserCreateSerializer, CustomUserSerializer,
                           IngredientSerializer, RecipeCreateUpdateSerializer,
-                          RecipeSerializer, ShortInfoRecipeSerializer,
-                          SubscriptionSerializer, TagSerializer)
+                          RecipeIdsSerializer, RecipeSerializer,
+                          ShortInfoRecipeSerializer, SubscriptionSerializer,
+                          TagSerializer)
+from .shopping_list import FORMATS as SHOPPING_LIST_FORMATS
+from .uploads import ImageUploadParser, UploadLimitMixin
+from recipes.counters import accounted, shift_counters
+from recipes.feed import Timeline, backfill, prune, subscribers_changed
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingCartIngredient, Tag)
+from recipes.shopping_cart import (cart_users, change_totals, negate,
+                                   recipe_amounts)
+from recipes.short_links import recipe_ids
+from recipes.trending import score_change
 from users.models import Subscription
 
 User = get_user_model()
 
+SHORT_LINK_CHARACTERS = frozenset(baseconv.BASE64_ALPHABET)
+# Самый большой id (2 ** 63 - 1) кодируется 11 символами.
+SHORT_LINK_MAX_LENGTH = 11
+# Ответ для несуществующих рецептов кэшируется недолго: рецепт с таким
+# id может появиться.
+SHORT_LINK_MISSING_MAX_AGE = 60
+short_links_cache = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+
+# Счетчик рецепта, который меняется вместе со списком пользователя.
+RECIPE_COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingCart: "shopping_cart_count",
+}
+
+
+def annotate_is_subscribed(queryset, user):
+    """Добавляет пользователям признак подписки текущего пользователя.
+
+    Один подзапрос EXISTS вместо отдельного запроса на каждого
+    пользователя и без загрузки всех подписчиков автора.
+    """
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(
+                user_id=user.id, author=OuterRef("pk")
+            )
+        )
+    )
 
-class UserViewSet(djoser_views.UserViewSet):
+
+class UserViewSet(UploadLimitMixin, djoser_views.UserViewSet):
     """Вьюсет для модели пользователей."""
 
     pagination_class = LimitPagePagination
@@ -42,8 +90,10 @@ class UserViewSet(djoser_views.UserViewSet):
 
     def get_queryset(self):
         if self.action == "subscriptions":
-            return Subscription.objects.filter(user=self.request.user)
-        return User.objects.all()
+            return Subscription.objects.filter(
+                user=self.request.user
+            ).select_related("author")
+        return annotate_is_subscribed(User.objects.all(), self.request.user)
 
     @action(
         methods=("get",),
@@ -59,15 +109,19 @@ class UserViewSet(djoser_views.UserViewSet):
         permission_classes=(IsAuthenticated,),
         url_path="me/avatar",
         url_name="me-avatar",
+        parser_classes=(JSONParser, MultiPartParser, ImageUploadParser),
     )
     def avatar(self, request):
-        if "avatar" not in request.data:
+        data = request.data
+        if request.content_type.startswith("image/"):
+            data = {"avatar": data["file"]}
+        if "avatar" not in data:
             return Response(
                 "Необходимо добавить фото!",
                 status=status.HTTP_400_BAD_REQUEST
             )
         serializer = CustomUserSerializer(
-            self.get_instance(), data=request.data, partial=True,
+            self.get_instance(), data=data, partial=True,
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -113,11 +167,34 @@ class UserViewSet(djoser_views.UserViewSet):
     )
     def subscriptions(self, request):
         paginate_queryset = self.paginate_queryset(self.get_queryset())
+        self.prefetch_author_recipes(
+            [subscription.author for subscription in paginate_queryset],
+            request.query_params.get("recipes_limit"),
+        )
         serializer = SubscriptionSerializer(
             paginate_queryset, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def prefetch_author_recipes(authors, recipes_limit):
+        """Загружает рецепты всех авторов страницы одним запросом.
+
+        Для каждого автора берется не больше recipes_limit последних
+        рецептов, все авторы страницы - подписки текущего пользователя.
+        """
+        recipes = Recipe.objects.filter(author__in=authors)
+        try:
+            recipes = recipes.latest_per_author(int(recipes_limit))
+        except (ValueError, TypeError):
+            pass
+        prefetch_related_objects(authors, Prefetch(
+            "recipes",
+            queryset=recipes.order_by("-creation_date", "-id"),
+        ))
+        for author in authors:
+            author.is_subscribed = True
+
     @action(
         methods=("post",),
         detail=True,
@@ -133,24 +210,47 @@ class UserViewSet(djoser_views.UserViewSet):
             }
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user, author=author)
+        author.is_subscribed = True
+        with transaction.atomic():
+            serializer.save(user=request.user, author=author)
+            backfill(request.user.pk, author)
+            shift_counters(
+                User.objects.filter(pk=request.user.pk),
+                1,
+                "subscriptions_count",
+            )
+            shift_counters(
+                User.objects.filter(pk=author.pk), 1, "subscribers_count"
+            )
+            subscribers_changed(author.pk, 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, id):
         author = get_object_or_404(User, id=id)
-        subscription_deleted, _ = Subscription.objects.filter(
-            user=request.user, author=author
-        ).delete()
-        if not subscription_deleted:
-            return Response(
-                {"errors": "Вы не подписаны на данного автора!"},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic(), accounted():
+            subscription_deleted, _ = Subscription.objects.filter(
+                user=request.user, author=author
+            ).delete()
+            if not subscription_deleted:
+                return Response(
+                    {"errors": "Вы не подписаны на данного автора!"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            prune(request.user.pk, author.pk)
+            shift_counters(
+                User.objects.filter(pk=request.user.pk),
+                -1,
+                "subscriptions_count",
+            )
+            shift_counters(
+                User.objects.filter(pk=author.pk), -1, "subscribers_count"
             )
+            subscribers_changed(author.pk, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для модели тегов."""
 
     queryset = Tag.objects.all()
@@ -159,7 +259,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для модели ингредиентов."""
 
     queryset = Ingredient.objects.all()
@@ -169,12 +269,35 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def is_search(self):
+        return bool(
+            {"name", "search"}.intersection(self.request.query_params)
+        )
+
+    def get_list_data(self, request, *args, **kwargs):
+        """Список ингредиентов с поиском по индексу в памяти.
 
-class RecipeViewSet(viewsets.ModelViewSet):
+        ``name`` - совпадение по началу названия, ``search`` - по началу,
+        а затем по подстроке. Результаты отсортированы по популярности
+        ингредиента, база данных при поиске не используется. Готовый
+        ответ хранится под версией справочников (ETag одинаков во всех
+        процессах), поэтому новая популярность попадает в ответы после
+        смены версии.
+        """
+        if not self.is_search():
+            return super().get_list_data(request, *args, **kwargs)
+        search = request.query_params.get("search")
+        return ingredient_index.search(
+            request.query_params["name"] if search is None else search,
+            substring=search is not None,
+        )
+
+
+class RecipeViewSet(UploadLimitMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
 
     http_method_names = ["get", "post", "patch", "delete"]
-    pagination_class = LimitPagePagination
+    pagination_class = RecipePagination
     # permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
@@ -199,14 +322,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action in (
             "list",
             "retrieve",
+            "feed",
+            "similar",
         ):
             recipes = (
-                recipes.select_related("author")
-                .prefetch_related(
-                    "recipe_ingredients__ingredient",
-                    "recipe_ingredients",
+                recipes.prefetch_related(
+                    Prefetch(
+                        "author",
+                        queryset=annotate_is_subscribed(
+                            User.objects.all(), user
+                        ),
+                    ),
+                    Prefetch(
+                        "recipe_ingredients",
+                        queryset=RecipeIngredient.objects.select_related(
+                            "ingredient"
+                        ),
+                    ),
                     "tags",
-                    "author__subscribers",
                 )
                 .annotate(
                     is_in_shopping_cart=Exists(
@@ -223,7 +356,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 .all()
             )
 
-        return recipes.order_by("-creation_date").all()
+        return recipes.order_by("-creation_date", "-id").all()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(), accounted():
+            change_totals(
+                cart_users(instance.pk),
+                negate(recipe_amounts([instance.pk])),
+            )
+            instance.delete()
+            shift_counters(
+                User.objects.filter(pk=instance.author_id), -1, "recipes_count"
+            )
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь, новые
+        первыми. Поддерживает те же фильтры и пагинацию, что и список."""
+        timeline = Timeline(
+            request.user.pk, self.filter_queryset(self.get_queryset())
+        )
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(timeline, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=("get",), detail=True)
+    def similar(self, request, pk=None):
+        """Рецепты, похожие на данный по ингредиентам и тегам, начиная с
+        самых похожих. Списки считает команда build_similar_recipes."""
+        recipe = get_object_or_404(Recipe.objects.only("pk"), pk=pk)
+        recipes = self.get_queryset().filter(
+            similar_to__recipe=recipe
+        ).annotate(similarity=F("similar_to__score")).order_by(
+            "-similarity", "-id"
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
 
     @action(
         methods=["post"],
@@ -272,6 +445,120 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return response
 
+    @action(
+        methods=["post"],
+        detail=False,
+        url_path="shopping_cart",
+        url_name="shopping-cart-bulk",
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_change(request, ShoppingCart)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_delete_shopping_cart(self, request):
+        return self.bulk_change(request, ShoppingCart, remove=True)
+
+    @action(
+        methods=["post"],
+        detail=False,
+        url_path="favorite",
+        url_name="favorite-bulk",
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_change(request, Favorite)
+
+    @bulk_favorite.mapping.delete
+    def bulk_delete_favorite(self, request):
+        return self.bulk_change(request, Favorite, remove=True)
+
+    def bulk_change(self, request, model, remove=False):
+        """Добавляет (удаляет) рецепты из тела запроса ``{"recipes": [id]}``.
+
+        Возвращает итог по каждому id: added, already_added, removed,
+        not_added или not_found.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        change = self.remove_recipes if remove else self.add_recipes
+        outcomes, _ = change(request.user, model, recipe_ids)
+        return Response([
+            {"id": recipe_id, "status": outcomes[recipe_id]}
+            for recipe_id in recipe_ids
+        ])
+
+    @staticmethod
+    def lock_user(user):
+        """Блокирует строку пользователя до конца транзакции: изменения
+        его списков выполняются по очереди."""
+        list(
+            User.objects.select_for_update()
+            .filter(pk=user.pk)
+            .values_list("pk", flat=True)
+        )
+
+    def add_recipes(self, user, model, recipe_ids):
+        """Добавляет рецепты recipe_ids в список model пользователя.
+
+        Возвращает итоги по id и найденные рецепты ``{id: рецепт}``.
+        """
+        with transaction.atomic():
+            self.lock_user(user)
+            recipes = Recipe.objects.only(
+                "id", "name", "image", "cooking_time"
+            ).in_bulk(recipe_ids)
+            present = set(
+                model.objects.filter(
+                    user=user, recipe_id__in=recipes
+                ).values_list("recipe_id", flat=True)
+            )
+            added = [pk for pk in recipes if pk not in present]
+            model.objects.bulk_create(
+                (model(user=user, recipe_id=pk) for pk in added),
+                ignore_conflicts=True,
+            )
+            shift_counters(
+                Recipe.objects.filter(pk__in=added),
+                1,
+                RECIPE_COUNTERS[model],
+                trending_score=score_change(model, 1),
+            )
+            if model is ShoppingCart and added:
+                change_totals([user.pk], recipe_amounts(added))
+        outcomes = {pk: "not_found" for pk in recipe_ids}
+        outcomes.update({pk: "already_added" for pk in present})
+        outcomes.update({pk: "added" for pk in added})
+        return outcomes, recipes
+
+    def remove_recipes(self, user, model, recipe_ids):
+        """Удаляет рецепты recipe_ids из списка model пользователя.
+
+        Возвращает итоги по id и найденные рецепты ``{id: рецепт}``.
+        """
+        with transaction.atomic(), accounted():
+            self.lock_user(user)
+            entries = model.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            )
+            removed = list(entries.values_list("recipe_id", flat=True))
+            entries.delete()
+            shift_counters(
+                Recipe.objects.filter(pk__in=removed),
+                -1,
+                RECIPE_COUNTERS[model],
+                trending_score=score_change(model, -1),
+            )
+            if model is ShoppingCart and removed:
+                change_totals([user.pk], negate(recipe_amounts(removed)))
+        missing = set(recipe_ids) - set(removed)
+        recipes = Recipe.objects.in_bulk(missing) if missing else {}
+        outcomes = {pk: "not_found" for pk in recipe_ids}
+        outcomes.update({pk: "not_added" for pk in recipes})
+        outcomes.update({pk: "removed" for pk in removed})
+        return outcomes, recipes
+
     def add_recipe(self, request, pk, model):
         """Функция добавления рецепта в избранное/список покупок.
 
@@ -283,25 +570,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         Args:
             request: объект запроса
-            modelуемая модель
+            model: используемая модель
             pk: id рецепта
 
         Returns:
             Response | False: запрос(Response) или False(bool)
         """
-        recipe = Recipe.objects.filter(pk=pk).first()
-        if recipe:
-            user = request.user
-            if model.objects.filter(recipe=recipe, user=user).exists():
-                return False
-            model.objects.create(recipe=recipe, user=user)
-            serializer = ShortInfoRecipeSerializer(recipe)
+        try:
+            pk = int(pk)
+        except ValueError:
+            pk = None
+        outcomes, recipes = self.add_recipes(request.user, model, [pk])
+        if outcomes[pk] == "not_found":
             return Response(
-                data=serializer.data, status=status.HTTP_201_CREATED
+                "Рецепт не существует. Проверьте id.",
+                status=status.HTTP_400_BAD_REQUEST
             )
+        if outcomes[pk] == "already_added":
+            return False
+        serializer = ShortInfoRecipeSerializer(recipes[pk])
         return Response(
-            "Рецепт не существует. Проверьте id.",
-            status=status.HTTP_400_BAD_REQUEST
+            data=serializer.data, status=status.HTTP_201_CREATED
         )
 
     def delete_recipe(self, request, pk, model):
@@ -321,44 +610,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
         Returns:
             Response | False: запрос(Response) или False(bool)
         """
-        recipe = get_object_or_404(Recipe, pk=pk)
-        user = request.user
         try:
-            obj = get_object_or_404(model, recipe=recipe, user=user)
-            obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Http404:
+            pk = int(pk)
+        except ValueError:
+            raise Http404
+        outcomes, _ = self.remove_recipes(request.user, model, [pk])
+        if outcomes[pk] == "not_found":
+            raise Http404
+        if outcomes[pk] == "not_added":
             return False
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=False,
         url_path="download_shopping_cart",
         methods=("get",),
         permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            PlainTextRenderer, CSVRenderer, JSONRenderer, PDFRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_cart__user=request.user
-            )
-            .values(
-                "ingredient__name",
-                "ingredient__measurement_unit",
-            )
+        """Потоковая выгрузка списка покупок.
+
+        Формат выбирается параметром ``format`` (txt, csv, json, pdf)
+        или заголовком Accept, по умолчанию - текст.
+        """
+        renderer = request.accepted_renderer
+        rows = (
+            ShoppingCartIngredient.objects.filter(user=request.user)
             .order_by("ingredient__name")
-            .annotate(total=Sum("amount"))
+            .values_list(
+                "ingredient__name", "ingredient__measurement_unit", "amount"
+            )
+            .iterator(chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_FORMATS[renderer.format](rows),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
-        shopping_list = ["Список покупок\n"]
-        shopping_list += [
-            f'{ingredient["ingredient__name"]} - '
-            f'{ingredient["total"]} '
-            f'({ingredient["ingredient__measurement_unit"]})\n'
-            for ingredient in ingredients
-        ]
-        response = HttpResponse(shopping_list, content_type="text/plain")
-        response[
-            "Content-Disposition"
-        ] = 'attachment; filename="shopping_list.txt"'
         return response
 
     @action(
@@ -380,14 +676,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 class ShortLinkView(APIView):
+    """Перенаправление с короткой ссылки на страницу рецепта.
+
+    Id, которых точно нет (битовая карта recipe_ids), отклоняются без
+    запроса к базе, найденные ссылки запоминаются в LRU-кэше процесса
+    вместе с поколением карты и действуют, пока поколение не изменилось.
+    Ответы разрешено кэшировать ненадолго, повторные запросы принимает
+    nginx.
+    """
+
+    # Ссылки открываются без входа, токен не проверяется.
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
     def get(self, request, encoded_id):
-        if not set(encoded_id).issubset(set(baseconv.BASE64_ALPHABET)):
-            return Response(
-                {"error": "Недопустимые символы в ссылке на рецепт"},
-                status=status.HTTP_400_BAD_REQUEST,
+        recipe_id = self.cached(encoded_id)
+        if recipe_id is None:
+            if not SHORT_LINK_CHARACTERS.issuperset(encoded_id):
+                return Response(
+                    {"error": "Недопустимые символы в ссылке на рецепт"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            recipe_id = self.resolve(encoded_id)
+        if recipe_id is None or not recipe_ids.may_exist(recipe_id):
+            response = Response(
+                {"detail": "Страница не найдена."},
+                status=status.HTTP_404_NOT_FOUND,
             )
-        recipe_id = baseconv.base64.decode(encoded_id)
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        return HttpResponseRedirect(
-            request.build_absolute_uri(f"/recipes/{recipe.id}")
+            patch_cache_control(
+                response, public=True, max_age=SHORT_LINK_MISSING_MAX_AGE
+            )
+            return response
+        return self.redirect(request, recipe_id)
+
+    @staticmethod
+    def redirect(request, recipe_id):
+        response = HttpResponseRedirect(
+            request.build_absolute_uri(f"/recipes/{recipe_id}")
+        )
+        patch_cache_control(
+            response, public=True, max_age=settings.SHORT_LINK_MAX_AGE
         )
+        return response
+
+    @staticmethod
+    def cached(encoded_id, refresh=True):
+        """id рецепта из кэша ссылок, если ссылка найдена в текущем
+        поколении карты."""
+        entry = short_links_cache.get(encoded_id)
+        if entry is None:
+            return None
+        recipe_id, version = entry
+        if version != recipe_ids.current(refresh):
+            return None
+        return recipe_id
+
+    @staticmethod
+    def resolve(encoded_id):
+        """id рецепта по ссылке или None, если рецепта нет."""
+        if len(encoded_id) > SHORT_LINK_MAX_LENGTH:
+            return None
+        recipe_id = baseconv.base64.decode(encoded_id)
+        if not recipe_ids.may_exist(recipe_id):
+            return None
+        version = recipe_ids.current()
+        if not Recipe.objects.filter(pk=recipe_id).exists():
+            recipe_ids.discard(recipe_id)
+            return None
+        short_links_cache.set(encoded_id, (recipe_id, version))
+        return recipe_id
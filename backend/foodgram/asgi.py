@@ -8,9 +8,27 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+import threading
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+# Частые GET-запросы обслуживаются асинхронными представлениями.
+os.environ.setdefault("ASYNC_VIEWS", "true")
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# Обработчик отдает потоковые ответы из пула потоков ORM.
+from api.async_views import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
+
+# Подготовка процесса (foodgram.startup) выполняется в отдельном потоке:
+# сервер (uvicorn) может импортировать приложение уже внутри цикла
+# событий, где ORM недоступна. Пул потоков ORM для этого не используется:
+# его потоки не переживут fork при preload_app.
+from foodgram.startup import warm_up  # noqa: E402
+
+warmup = threading.Thread(target=warm_up)
+warmup.start()
+warmup.join()
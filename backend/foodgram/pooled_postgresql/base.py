@@ -0,0 +1,50 @@
+"""Бэкенд PostgreSQL с пулом соединений процесса (см. pool).
+
+Django закрывает соединение в конце каждого запроса (CONN_MAX_AGE = 0),
+а этот бэкенд вместо закрытия возвращает его в пул, и следующий запрос
+получает готовое соединение без подключения к серверу. Настройки пула -
+в DATABASES[...]["POOL"]. Время ожидания соединения из пула попадает в
+метрику pool заголовка Server-Timing.
+"""
+from django.db.backends.postgresql import base, creation
+
+from api.timing import current_timings
+
+from .pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Свободные соединения пула не дадут удалить тестовую базу.
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    pool_entry = None
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(conn_params, self.settings_dict.get("POOL", {}))
+        entry, waited = pool.checkout(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        # Уровень изоляции вычисляется только при подключении.
+        if "isolation_level" not in entry.extra:
+            entry.extra["isolation_level"] = self.isolation_level
+        self.isolation_level = entry.extra["isolation_level"]
+        self.pool_entry = entry
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add("pool", waited)
+        return entry.connection
+
+    def _close(self):
+        entry, self.pool_entry = self.pool_entry, None
+        if entry is None or entry.connection is not self.connection:
+            return super()._close()
+        # После ошибки (кроме ошибок данных) соединение не переиспользуется.
+        entry.pool.release(entry, discard=self.errors_occurred)
@@ -0,0 +1,266 @@
+"""Пул соединений с PostgreSQL внутри процесса.
+
+Пул ограничен SIZE соединениями: при их нехватке запрос ждет
+освобождения не дольше TIMEOUT секунд. Соединение проверяется при выдаче
+(закрыто, осталась открытая транзакция; после простоя дольше
+CHECK_INTERVAL секунд - запросом SELECT 1) и пересоздается после MAX_AGE
+секунд жизни или MAX_USES выдач. Свободные соединения выдаются в порядке
+LIFO, так что лишние устаревают и закрываются.
+
+После fork (gunicorn --preload) дочерний процесс забывает соединения
+родителя, не закрывая их: сокеты общие, и закрытие оборвало бы
+соединения родителя.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger("foodgram.db_pool")
+
+# Параметры подключения -> пул.
+pools = {}
+pools_lock = threading.Lock()
+
+
+class Entry:
+    """Соединение пула и его история."""
+
+    __slots__ = (
+        "connection", "pool", "created", "last_used", "uses", "generation",
+        "extra",
+    )
+
+    def __init__(self, connection, pool):
+        self.connection = connection
+        self.pool = pool
+        self.created = self.last_used = time.monotonic()
+        self.uses = 0
+        self.generation = None
+        # Данные, которые DatabaseWrapper вычисляет при подключении.
+        self.extra = {}
+
+
+class ConnectionPool:
+    def __init__(self, database, size, timeout, max_age, max_uses,
+                 check_interval, log_interval):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.check_interval = check_interval
+        self.log_interval = log_interval
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        # Соединения прошлых поколений принадлежат родительскому процессу.
+        self.generation += 1
+        self.condition = threading.Condition()
+        self.idle = deque()
+        # Выданные соединения и соединения, которые сейчас открываются.
+        self.in_use = 0
+        self.counters = dict.fromkeys((
+            "checkouts", "waits", "timeouts", "opened", "recycled",
+            "discarded",
+        ), 0)
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.logged_at = time.monotonic()
+        self.logged_checkouts = 0
+
+    def checkout(self, connect):
+        """Соединение для запроса и время ожидания в секундах.
+
+        connect() открывает новое соединение.
+        """
+        start = time.monotonic()
+        with self.condition:
+            while not self.idle and self.in_use >= self.size:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.count("timeouts")
+                    logger.warning(json.dumps(self.stats()))
+                    raise psycopg2.OperationalError(
+                        f"Пул соединений с {self.database} исчерпан: "
+                        f"все {self.size} заняты дольше {self.timeout} с"
+                    )
+                self.condition.wait(remaining)
+            entry = self.idle.pop() if self.idle else None
+            self.in_use += 1
+            waited = time.monotonic() - start
+            self.count("checkouts")
+            if waited > 0.001:
+                self.count("waits")
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.maybe_log()
+        try:
+            if entry is not None and not self.is_valid(entry):
+                entry = None
+            if entry is None:
+                entry = Entry(connect(), self)
+                self.count("opened")
+        except BaseException:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        entry.uses += 1
+        entry.generation = self.generation
+        return entry, waited
+
+    def count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def is_valid(self, entry):
+        """Проверяет свободное соединение; негодное закрывает."""
+        if self.is_expired(entry):
+            self.count("recycled")
+            self.close_quietly(entry)
+            return False
+        connection = entry.connection
+        try:
+            valid = (
+                not connection.closed
+                and connection.get_transaction_status()
+                == extensions.TRANSACTION_STATUS_IDLE
+            )
+            if valid and (
+                time.monotonic() - entry.last_used > self.check_interval
+            ):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+        except psycopg2.Error:
+            valid = False
+        if not valid:
+            self.count("discarded")
+            self.close_quietly(entry)
+        return valid
+
+    def is_expired(self, entry):
+        return (
+            time.monotonic() - entry.created >= self.max_age
+            or entry.uses >= self.max_uses
+        )
+
+    def release(self, entry, discard=False):
+        """Возвращает соединение в пул (закрывает негодное)."""
+        if entry.generation != self.generation:
+            inherited.append(entry)
+            return
+        connection = entry.connection
+        if not discard:
+            try:
+                if connection.closed:
+                    discard = True
+                elif (
+                    connection.get_transaction_status()
+                    != extensions.TRANSACTION_STATUS_IDLE
+                ):
+                    connection.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard:
+            self.count("discarded")
+        elif self.is_expired(entry):
+            self.count("recycled")
+            discard = True
+        if discard:
+            self.close_quietly(entry)
+        else:
+            entry.last_used = time.monotonic()
+        with self.condition:
+            self.in_use -= 1
+            if not discard:
+                self.idle.append(entry)
+            self.condition.notify()
+
+    def close_idle(self):
+        with self.condition:
+            entries, self.idle = self.idle, deque()
+        for entry in entries:
+            self.close_quietly(entry)
+
+    @staticmethod
+    def close_quietly(entry):
+        try:
+            entry.connection.close()
+        except psycopg2.Error:
+            pass
+
+    def stats(self):
+        """Метрики пула: занятость и ожидание выдачи."""
+        checkouts = self.counters["checkouts"]
+        return {
+            "database": self.database,
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": len(self.idle),
+            "saturation": round(self.in_use / self.size, 3),
+            **self.counters,
+            "wait_ms_avg": round(
+                self.wait_time * 1000 / checkouts if checkouts else 0, 3
+            ),
+            "wait_ms_max": round(self.max_wait * 1000, 3),
+        }
+
+    def maybe_log(self):
+        """Раз в log_interval секунд пишет метрики в лог (под condition)."""
+        now = time.monotonic()
+        if (
+            now - self.logged_at < self.log_interval
+            or self.counters["checkouts"] == self.logged_checkouts
+        ):
+            return
+        self.logged_at = now
+        self.logged_checkouts = self.counters["checkouts"]
+        logger.info(json.dumps(self.stats()))
+
+
+def get_pool(conn_params, options):
+    """Пул процесса для параметров подключения."""
+    key = repr(sorted(conn_params.items()))
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            pool = pools[key] = ConnectionPool(
+                conn_params.get("database"),
+                size=options.get("SIZE", 4),
+                timeout=options.get("TIMEOUT", 10),
+                max_age=options.get("MAX_AGE", 1800),
+                max_uses=options.get("MAX_USES", 1000),
+                check_interval=options.get("CHECK_INTERVAL", 30),
+                log_interval=options.get("LOG_INTERVAL", 60),
+            )
+        return pool
+
+
+def close_pools(database=None):
+    """Закрывает свободные соединения пулов (всех или одной базы)."""
+    for pool in list(pools.values()):
+        if database is None or pool.database == database:
+            pool.close_idle()
+
+
+# Соединения родителя, которые дочерний процесс не должен закрывать.
+inherited = []
+
+
+def forget_pools():
+    global pools_lock
+    pools_lock = threading.Lock()
+    for pool in pools.values():
+        # Условие могло остаться захваченным другим потоком родителя.
+        inherited.extend(pool.idle)
+        pool.reset()
+
+
+os.register_at_fork(after_in_child=forget_pools)
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -65,14 +66,33 @@ TEMPLATES = [
 WSGI_APPLICATION = "foodgram.wsgi.application"
 
 
+# DB_POOL=true включает пул соединений процесса (foodgram.pooled_postgresql):
+# не больше DB_POOL_SIZE соединений, ожидание свободного - до
+# DB_POOL_TIMEOUT секунд. Соединение пересоздается через DB_POOL_MAX_AGE
+# секунд или DB_POOL_MAX_USES выдач и проверяется запросом при выдаче после
+# простоя дольше DB_POOL_CHECK_INTERVAL секунд. Метрики пула пишутся в лог
+# foodgram.db_pool раз в DB_POOL_LOG_INTERVAL секунд
+DB_POOL = os.getenv('DB_POOL', '').lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram.pooled_postgresql' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'root'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 4)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_AGE': float(os.getenv('DB_POOL_MAX_AGE', 1800)),
+            'MAX_USES': int(os.getenv('DB_POOL_MAX_USES', 1000)),
+            'CHECK_INTERVAL': float(os.getenv('DB_POOL_CHECK_INTERVAL', 30)),
+            'LOG_INTERVAL': float(os.getenv('DB_POOL_LOG_INTERVAL', 60)),
+        },
     }
 }
 
@@ -134,7 +154,7 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -143,6 +163,127 @@ REST_FRAMEWORK = {
     # "PAGE_SIZE": 6,
 }
 
+# Общий для всех процессов кэш: версия справочников (recipes.catalog) и
+# сбросы токенов (api.authentication). По умолчанию - таблица в базе
+# (создается миграцией), CACHE_BACKEND и CACHE_LOCATION задают другой
+# общий бэкенд, например memcached. Кэш в памяти процесса (LocMemCache)
+# не подходит: изменения не увидят другие процессы
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "foodgram_cache"),
+    }
+}
+# Версии из общего кэша (recipes.versions) процесс перечитывает не чаще
+# раза в SHARED_VERSION_TTL секунд, остальные запросы их не читают
+SHARED_VERSION_TTL = float(os.getenv("SHARED_VERSION_TTL", 1))
+
+# Индекс поиска ингредиентов перестраивается не реже, чем раз в
+# INGREDIENT_INDEX_TTL секунд (обновляется популярность ингредиентов)
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+
+# Число готовых ответов справочников (с разными параметрами запроса),
+# которые процесс хранит в памяти
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 256))
+
+# Список покупок читается из базы порциями по SHOPPING_LIST_CHUNK_SIZE строк
+SHOPPING_LIST_CHUNK_SIZE = int(os.getenv("SHOPPING_LIST_CHUNK_SIZE", 500))
+# TTF-шрифт с кириллицей для выгрузки списка покупок в PDF
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
+# Конфигурация текстового поиска PostgreSQL для поиска рецептов (после
+# изменения выполните rebuild_search_index)
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "russian")
+
+# Наибольший размер картинки, загружаемой файлом (multipart или телом
+# запроса), в байтах
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv("IMAGE_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+)
+
+# Уменьшенные копии картинок (WebP и JPEG) указанной ширины строятся в
+# IMAGE_DERIVATIVE_WORKERS потоках; в очереди не больше
+# IMAGE_DERIVATIVE_QUEUE задач. Без IMAGE_DERIVATIVES_ENABLED (и в тестах,
+# см. foodgram.test_runner) копии при сохранении не строятся
+IMAGE_DERIVATIVES_ENABLED = (
+    os.getenv("IMAGE_DERIVATIVES_ENABLED", "true").lower() == "true"
+)
+IMAGE_DERIVATIVE_WIDTHS = tuple(
+    int(width)
+    for width in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "320,640").split(",")
+)
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", 2))
+IMAGE_DERIVATIVE_QUEUE = int(os.getenv("IMAGE_DERIVATIVE_QUEUE", 100))
+
+TEST_RUNNER = "foodgram.test_runner.TestRunner"
+
+# Лента подписок хранит FEED_MAX_LENGTH последних рецептов; рецепты
+# авторов, у которых больше FEED_FANOUT_MAX_SUBSCRIBERS подписчиков, в
+# ленты не копируются и выбираются при чтении
+FEED_MAX_LENGTH = int(os.getenv("FEED_MAX_LENGTH", 500))
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv("FEED_FANOUT_MAX_SUBSCRIBERS", 1000)
+)
+
+# Счет популярности рецептов (?ordering=trending) уменьшается вдвое за
+# TRENDING_HALF_LIFE_HOURS часов (команда decay_trending)
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 24))
+
+# Число похожих рецептов, которые хранятся для каждого рецепта (команда
+# build_similar_recipes)
+SIMILAR_RECIPES_COUNT = int(os.getenv("SIMILAR_RECIPES_COUNT", 10))
+
+# Короткие ссылки: процесс помнит SHORT_LINK_CACHE_SIZE найденных ссылок
+# и перестраивает карту id рецептов раз в SHORT_LINK_BITMAP_TTL секунд
+# (после удаления рецепта - не позже чем через SHARED_VERSION_TTL);
+# перенаправления кэшируются на SHORT_LINK_MAX_AGE секунд, столько
+# удаленный рецепт может открываться из кэша nginx и браузера
+SHORT_LINK_CACHE_SIZE = int(os.getenv("SHORT_LINK_CACHE_SIZE", 10000))
+SHORT_LINK_BITMAP_TTL = int(os.getenv("SHORT_LINK_BITMAP_TTL", 3600))
+SHORT_LINK_MAX_AGE = int(os.getenv("SHORT_LINK_MAX_AGE", 60))
+
+# Пользователь, найденный по токену, хранится в памяти процесса
+# AUTH_TOKEN_CACHE_TTL секунд (не больше AUTH_TOKEN_CACHE_SIZE токенов).
+# Сбросы (выход, смена пароля, деактивация) передаются другим процессам
+# через общий кэш AUTH_TOKEN_SHARED_CACHE из CACHES и действуют в них не
+# позже чем через SHARED_VERSION_TTL
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 60))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_SHARED_CACHE = os.getenv("AUTH_TOKEN_SHARED_CACHE", "default")
+
+# Под ASGI (foodgram.asgi включает ASYNC_VIEWS) частые GET-запросы
+# обслуживаются асинхронными представлениями api.async_views, а ORM
+# выполняется в ASYNC_DB_THREADS потоках (по умолчанию - DB_POOL_SIZE)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "").lower() == "true"
+ASYNC_DB_THREADS = int(
+    os.getenv("ASYNC_DB_THREADS", DATABASES["default"]["POOL"]["SIZE"])
+)
+
+# Заголовок Server-Timing с временем БД, представления, сериализаторов и
+# рендеринга. Замеряется доля SERVER_TIMING_SAMPLE_RATE запросов; при
+# SERVER_TIMING_LOG запросы дольше SERVER_TIMING_SLOW_MS мс пишутся в лог
+# foodgram.timing
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "").lower() == "true"
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", 1))
+SERVER_TIMING_LOG = os.getenv("SERVER_TIMING_LOG", "").lower() == "true"
+SERVER_TIMING_SLOW_MS = float(os.getenv("SERVER_TIMING_SLOW_MS", 500))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "foodgram.timing": {"handlers": ["console"], "level": "INFO"},
+        "foodgram.db_pool": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "HIDE_USERS": False,
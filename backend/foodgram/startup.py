@@ -0,0 +1,24 @@
+"""Подготовка процесса к запросам при старте.
+
+Загружаются маршруты (а с ними представления, сериализаторы и DRF),
+строятся индекс поиска ингредиентов и карта id рецептов. При запуске
+gunicorn с preload_app (gunicorn.conf.py) это происходит один раз в
+главном процессе до fork: воркеры стартуют сразу готовыми и делят
+эти данные с главным процессом (copy-on-write), пока не перестроят
+свои копии по TTL.
+"""
+from django.db import connections
+from django.urls import get_resolver
+
+from api.ingredient_search import ingredient_index
+from foodgram.pooled_postgresql.pool import close_pools
+from recipes.short_links import recipe_ids
+
+
+def warm_up():
+    get_resolver().url_patterns
+    ingredient_index.warm()
+    recipe_ids.warm()
+    # Соединения с базой не должны достаться воркерам после fork.
+    connections.close_all()
+    close_pools()
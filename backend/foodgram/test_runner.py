@@ -0,0 +1,19 @@
+"""Запуск тестов проекта.
+
+Копии изображений в тестах не строятся: пул потоков работал бы после
+завершения теста, с его файлами и базой. Построение проверяют отдельные
+тесты, включая IMAGE_DERIVATIVES_ENABLED через override_settings.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.derivatives_enabled = settings.IMAGE_DERIVATIVES_ENABLED
+        settings.IMAGE_DERIVATIVES_ENABLED = False
+
+    def teardown_test_environment(self, **kwargs):
+        settings.IMAGE_DERIVATIVES_ENABLED = self.derivatives_enabled
+        super().teardown_test_environment(**kwargs)
@@ -3,13 +3,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.async_views import async_patterns
 from api.views import ShortLinkView
 
-urlpatterns = [
+urlpatterns = async_patterns([
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("s/<str:encoded_id>/", ShortLinkView.as_view(), name="shortlink"),
-]
+])
 
 if settings.DEBUG:
     urlpatterns += static(
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
 
 application = get_wsgi_application()
+
+# Маршруты, индекс поиска ингредиентов и карта id рецептов готовятся при
+# старте процесса, а не на первом запросе пользователя.
+from foodgram.startup import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,21 @@
+"""Настройки gunicorn (файл в рабочем каталоге читается автоматически).
+
+При GUNICORN_PRELOAD=true (по умолчанию) приложение загружается и
+готовится к запросам (foodgram.startup) один раз в главном процессе, а
+воркеры создаются fork и делят с ним память. Перезапуск воркера
+(max_requests, падение) не повторяет импорт и прогрев.
+"""
+import gc
+import os
+
+workers = int(os.getenv("GUNICORN_WORKERS", 3))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+# Воркер перезапускается после стольких запросов (0 - никогда).
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    # Объекты, созданные до fork, сборщик мусора воркеров не обходит и не
+    # записывает в их заголовки, поэтому страницы памяти остаются общими.
+    gc.freeze()
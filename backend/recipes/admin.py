@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from .constants import MIN_INGEDIENT_AMOUNT
+from .counters import counted_fields, shift_row_counters
 from .models import (
     Favorite,
     Ingredient,
@@ -10,10 +11,33 @@ from .models import (
     ShoppingCart,
     Tag
 )
+from .feed import fan_out
+from .search import update_search_index
+from .shopping_cart import cart_users, change_totals, negate, recipe_amounts
+from .trending import list_score_values
+
+
+class CountersAdminMixin:
+    """Сдвигает счетчики (recipes.counters) при добавлении строки в
+    админке и при смене ее связей; удаления учитывают сигналы."""
+
+    def save_model(self, request, obj, form, change):
+        model = type(obj)
+        if change and not counted_fields(model) & set(form.changed_data):
+            return super().save_model(request, obj, form, change)
+        old = model.objects.get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        if old is not None:
+            self.count_row(old, -1)
+        self.count_row(obj, 1)
+
+    def count_row(self, obj, delta):
+        model = type(obj)
+        shift_row_counters(obj, delta, **list_score_values(model, delta))
 
 
 class TagAdmin(admin.ModelAdmin):
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "bit")
     list_display_links = ("name", "slug")
     search_fields = ("name", "slug")
 
@@ -35,14 +59,14 @@ class RecipeIngredientInline(admin.TabularInline):
     min_num = MIN_INGEDIENT_AMOUNT
 
 
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("name", "author", "in_favorites")
+class RecipeAdmin(CountersAdminMixin, admin.ModelAdmin):
+    list_display = ("name", "author", "in_favorites", "shopping_cart_count")
     list_display_links = ("name", "author")
     search_fields = ("name", "author__username", "ingredients__name")
     search_help_text = "Поиск по названию рецепта или имени пользователя"
     filter_horizontal = ("tags", "ingredients")
     list_filter = ("tags",)
-    readonly_fields = ("in_favorites",)
+    readonly_fields = ("in_favorites", "shopping_cart_count")
     inlines = (RecipeIngredientInline,)
 
     fieldsets = (
@@ -51,7 +75,8 @@ class RecipeAdmin(admin.ModelAdmin):
             {
                 "fields": (
                     "author",
-                    ("name", "cooking_time", "in_favorites"),
+                    ("name", "cooking_time"),
+                    ("in_favorites", "shopping_cart_count"),
                     "text",
                     "image",
                     "tags",
@@ -66,19 +91,42 @@ class RecipeAdmin(admin.ModelAdmin):
         )
     )
     def in_favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
-
-class FavoriteAdmin(admin.ModelAdmin):
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        before = recipe_amounts([form.instance.pk]) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            # Разница в ингредиентах переносится в суммы списков покупок.
+            after = recipe_amounts([form.instance.pk])
+            change_totals(cart_users(form.instance.pk), {
+                ingredient: after.get(ingredient, 0)
+                - before.get(ingredient, 0)
+                for ingredient in before.keys() | after.keys()
+            })
+        form.instance.refresh_tags_mask()
+        update_search_index([form.instance.pk])
+        if not change:
+            fan_out(form.instance)
+
+
+class FavoriteAdmin(CountersAdminMixin, admin.ModelAdmin):
 
     list_display = ("id", "__str__")
     list_display_links = ("id", "__str__")
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = ("id", "__str__")
     list_display_links = ("id", "__str__")
 
+    def count_row(self, obj, delta):
+        super().count_row(obj, delta)
+        amounts = recipe_amounts([obj.recipe_id])
+        change_totals(
+            [obj.user_id], amounts if delta > 0 else negate(amounts)
+        )
+
 
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
@@ -5,3 +5,6 @@ class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
     verbose_name = "рецепты"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,23 @@
+"""Версия справочников тегов и ингредиентов.
+
+Версия меняется при любом изменении тега или ингредиента и хранится как
+recipes.versions.SharedVersion: процессы держат ее копию и по ней узнают,
+что их копии справочников устарели, в том числе после изменения в другом
+процессе (админка, команда load_catalog) - не позже чем через
+SHARED_VERSION_TTL.
+"""
+from .versions import SharedVersion
+
+CATALOG_VERSION_KEY = "catalog-version"
+
+catalog_version = SharedVersion(CATALOG_VERSION_KEY)
+
+
+def get_catalog_version():
+    """Текущая версия справочников."""
+    return catalog_version.get()
+
+
+def bump_catalog_version():
+    """Помечает все закэшированные копии справочников устаревшими."""
+    catalog_version.bump()
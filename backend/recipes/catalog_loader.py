@@ -0,0 +1,330 @@
+"""Загрузка справочников ингредиентов и тегов из CSV или JSON.
+
+Файл читается потоком, порциями по batch_size строк, и сливается со
+справочником по ключу (ингредиент - название и единица измерения, тег -
+слаг): новые строки добавляются, измененные обновляются, совпадающие не
+трогаются, поэтому повторная загрузка ничего не меняет. В PostgreSQL
+порция копируется (COPY) во временную таблицу и сливается со
+справочником запросами UPDATE и INSERT, в остальных СУБД - через
+bulk_update и bulk_create.
+
+Загрузка выполняется одной транзакцией. При dry_run транзакция
+откатывается, а отчет содержит список изменений.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .catalog import bump_catalog_version
+from .constants import TAG_BITS
+from .models import Ingredient, Tag
+
+BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+# Символы между объектами JSON-массива (и строк JSON Lines).
+JSON_SEPARATORS = " \t\r\n,[]"
+STAGING_TABLE = "catalog_staging"
+
+
+class Report:
+    """Итоги загрузки и список изменений."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(
+            ("inserted", "updated", "unchanged", "skipped"), 0
+        )
+        self.changes = []
+        self.errors = []
+
+    def skip(self, row, error):
+        self.counts["skipped"] += 1
+        self.errors.append(f"{row}: {error}")
+
+
+class Catalog:
+    """Справочник: модель, поля в файле и ключ слияния."""
+
+    # Слияние через COPY во временную таблицу (PostgreSQL).
+    copy = True
+
+    def __init__(self, model, fields, key):
+        self.model = model
+        self.fields = fields
+        self.key = key
+        self.update_fields = tuple(
+            name for name in fields if name not in key
+        )
+        # Уникальные поля вне ключа: строку, занимающую чужое значение,
+        # нельзя ни добавить, ни обновить.
+        self.unique = tuple(
+            name for name in self.update_fields
+            if model._meta.get_field(name).unique
+        )
+
+    def key_of(self, values):
+        if isinstance(values, dict):
+            return tuple(values[name] for name in self.key)
+        return tuple(getattr(values, name) for name in self.key)
+
+    def describe(self, row):
+        return ", ".join(row[name] for name in self.fields)
+
+    def clean(self, row):
+        """Проверенная строка; ValidationError, если она некорректна."""
+        cleaned = {}
+        for name in self.fields:
+            value = row.get(name)
+            if not isinstance(value, str) or not value.strip():
+                raise ValidationError(f"не заполнено поле {name}")
+            cleaned[name] = self.model._meta.get_field(name).clean(
+                value.strip(), None
+            )
+        return cleaned
+
+    def new_objects(self, rows, report):
+        return [self.model(**row) for row in rows]
+
+
+class TagCatalog(Catalog):
+    # Новым тегам нужны биты маски, строки создаются через ORM.
+    copy = False
+
+    def new_objects(self, rows, report):
+        free_bits = Tag.free_bits()
+        tags = []
+        for row in rows:
+            if not free_bits:
+                report.skip(
+                    self.describe(row),
+                    f"нельзя создать больше {TAG_BITS} тегов",
+                )
+                continue
+            tags.append(Tag(**row, bit=free_bits.pop(0)))
+        return tags
+
+
+CATALOGS = {
+    "ingredients": Catalog(
+        Ingredient, ("name", "measurement_unit"), ("name", "measurement_unit")
+    ),
+    "tags": TagCatalog(Tag, ("name", "slug"), ("slug",)),
+}
+
+
+def read_json(file):
+    """Объекты JSON-массива (или JSON Lines) по одному, без чтения всего
+    файла в память."""
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ""):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and (
+                buffer[position] in JSON_SEPARATORS
+            ):
+                position += 1
+            if position == len(buffer):
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # Объект дочитается со следующей порцией.
+            yield item
+    if buffer[position:].strip(JSON_SEPARATORS):
+        raise ValueError("Некорректный JSON в конце файла")
+
+
+def read_rows(path, fields, file_format=None):
+    """Строки файла словарями {поле: значение}."""
+    file_format = (file_format or Path(path).suffix.lstrip(".")).lower()
+    if file_format not in ("csv", "json"):
+        raise ValueError(f"Неизвестный формат файла: {file_format!r}")
+    with open(path, encoding="utf-8") as file:
+        if file_format == "csv":
+            for row in csv.reader(file):
+                if row:
+                    yield dict(zip(fields, row))
+            return
+        for item in read_json(file):
+            yield item if isinstance(item, dict) else dict(zip(fields, item))
+
+
+def clean_batch(catalog, rows, seen, report):
+    """Проверенные строки порции без повторов ключа и уникальных полей."""
+    cleaned = []
+    for row in rows:
+        try:
+            row = catalog.clean(row)
+        except ValidationError as error:
+            report.skip(row, "; ".join(error.messages))
+            continue
+        values = [("key", catalog.key_of(row))] + [
+            (name, row[name]) for name in catalog.unique
+        ]
+        repeated = next(
+            (name for name, value in values if value in seen[name]), None
+        )
+        if repeated is not None:
+            report.skip(catalog.describe(row), f"повтор в файле ({repeated})")
+            continue
+        for name, value in values:
+            seen[name].add(value)
+        cleaned.append(row)
+    return cleaned
+
+
+def without_conflicts(catalog, rows, report):
+    """Строки порции без тех, уникальные поля которых заняты записями
+    с другим ключом."""
+    for name in catalog.unique:
+        owners = {
+            values[0]: tuple(values[1:])
+            for values in catalog.model.objects.filter(**{
+                f"{name}__in": [row[name] for row in rows]
+            }).values_list(name, *catalog.key)
+        }
+        free = []
+        for row in rows:
+            owner = owners.get(row[name])
+            if owner is not None and owner != catalog.key_of(row):
+                report.skip(catalog.describe(row), f"{name} уже занято")
+            else:
+                free.append(row)
+        rows = free
+    return rows
+
+
+def merge_orm(catalog, rows, report):
+    existing = {
+        catalog.key_of(obj): obj
+        for obj in catalog.model.objects.filter(**{
+            f"{catalog.key[0]}__in": {row[catalog.key[0]] for row in rows}
+        })
+    }
+    new, changed = [], []
+    for row in rows:
+        obj = existing.get(catalog.key_of(row))
+        if obj is None:
+            new.append(row)
+            continue
+        old = {name: getattr(obj, name) for name in catalog.fields}
+        if old == row:
+            report.counts["unchanged"] += 1
+            continue
+        for name in catalog.update_fields:
+            setattr(obj, name, row[name])
+        changed.append(obj)
+        report.changes.append(
+            ("~", f"{catalog.describe(old)} -> {catalog.describe(row)}")
+        )
+    created = catalog.model.objects.bulk_create(
+        catalog.new_objects(new, report)
+    )
+    if changed:
+        catalog.model.objects.bulk_update(changed, catalog.update_fields)
+    report.counts["inserted"] += len(created)
+    report.counts["updated"] += len(changed)
+    report.changes.extend(
+        ("+", catalog.describe({
+            name: getattr(obj, name) for name in catalog.fields
+        }))
+        for obj in created
+    )
+
+
+def merge_copy(catalog, rows, report, cursor):
+    quote = connection.ops.quote_name
+    table = quote(catalog.model._meta.db_table)
+    staging = quote(STAGING_TABLE)
+    columns = ", ".join(quote(name) for name in catalog.fields)
+    key_matches = " AND ".join(
+        f"target.{quote(name)} = staging.{quote(name)}"
+        for name in catalog.key
+    )
+    cursor.execute(f"TRUNCATE {staging}")
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [row[name] for name in catalog.fields] for row in rows
+    )
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+    updated = 0
+    if catalog.update_fields:
+        assignments = ", ".join(
+            f"{quote(name)} = staging.{quote(name)}"
+            for name in catalog.update_fields
+        )
+        old_columns = ", ".join(
+            f"old.{quote(name)}" for name in catalog.fields
+        )
+        new_columns = ", ".join(
+            f"staging.{quote(name)}" for name in catalog.fields
+        )
+        # Самосоединение с old возвращает значения до обновления.
+        cursor.execute(
+            f"UPDATE {table} AS target SET {assignments} "
+            f"FROM {staging} AS staging, {table} AS old "
+            f"WHERE old.id = target.id AND {key_matches} AND "
+            f"({old_columns}) IS DISTINCT FROM ({new_columns}) "
+            f"RETURNING {old_columns}, {new_columns}"
+        )
+        count = len(catalog.fields)
+        for values in cursor.fetchall():
+            report.changes.append(("~", "{} -> {}".format(
+                ", ".join(values[:count]), ", ".join(values[count:])
+            )))
+            updated += 1
+    cursor.execute(
+        f"INSERT INTO {table} ({columns}) "
+        f"SELECT {columns} FROM {staging} AS staging "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} AS target "
+        f"WHERE {key_matches}) RETURNING {columns}"
+    )
+    inserted = cursor.fetchall()
+    report.changes.extend(("+", ", ".join(values)) for values in inserted)
+    report.counts["inserted"] += len(inserted)
+    report.counts["updated"] += updated
+    report.counts["unchanged"] += len(rows) - len(inserted) - updated
+
+
+def load_catalog(name, path, file_format=None, batch_size=BATCH_SIZE,
+                 dry_run=False):
+    """Сливает файл path со справочником name, возвращает Report."""
+    catalog = CATALOGS[name]
+    report = Report()
+    rows = read_rows(path, catalog.fields, file_format)
+    seen = {field: set() for field in ("key",) + catalog.unique}
+    use_copy = catalog.copy and connection.vendor == "postgresql"
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        if use_copy:
+            cursor.execute(
+                f"CREATE TEMP TABLE {quote(STAGING_TABLE)} ON COMMIT DROP AS "
+                "SELECT {} FROM {} WITH NO DATA".format(
+                    ", ".join(map(quote, catalog.fields)),
+                    quote(catalog.model._meta.db_table),
+                )
+            )
+        for batch in iter(lambda: list(islice(rows, batch_size)), []):
+            batch = without_conflicts(
+                catalog, clean_batch(catalog, batch, seen, report), report
+            )
+            if not batch:
+                continue
+            if use_copy:
+                merge_copy(catalog, batch, report, cursor)
+            else:
+                merge_orm(catalog, batch, report)
+        if dry_run:
+            transaction.set_rollback(True)
+        elif report.changes:
+            transaction.on_commit(bump_catalog_version)
+    return report
@@ -6,6 +6,8 @@ MAX_LENGTH = 256
 MIN_COOKING_TIME = 1
 MIN_INGEDIENT_AMOUNT = 1
 SLUG_MAX_LENGTH = 32
+# Число бит маски тегов рецепта (BigIntegerField без знакового бита)
+TAG_BITS = 63
 TAG_MAX_LENGTH = 32
 UNIT_MAX_LENGTH = 64
 URL_LENGTH: int = 70
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+# Денормализованные счетчики: (модель, поле счетчика,
+# модель, строки которой считаются, поле связи с моделью счетчика).
+COUNTERS = (
+    ("recipes.Recipe", "favorites_count", "recipes.Favorite", "recipe"),
+    ("recipes.Recipe", "shopping_cart_count", "recipes.ShoppingCart",
+     "recipe"),
+    ("users.User", "recipes_count", "recipes.Recipe", "author"),
+    ("users.User", "subscribers_count", "users.Subscription", "author"),
+    ("users.User", "subscriptions_count", "users.Subscription", "user"),
+)
+
+# Удаления, которые вызывающий код уже учел в счетчиках и суммах списков
+# покупок (API сдвигает их массово): сигналы удаления (recipes.signals)
+# их пропускают.
+deletes_accounted = ContextVar("deletes_accounted", default=False)
+
+
+@contextmanager
+def accounted():
+    """Удаления внутри блока уже учтены в счетчиках и суммах."""
+    token = deletes_accounted.set(True)
+    try:
+        yield
+    finally:
+        deletes_accounted.reset(token)
+
+
+def shift_counters(queryset, delta, *fields, **values):
+    """Сдвигает счетчики объектов queryset на delta одним UPDATE.
+
+    Вызывается в той же транзакции, что и изменение связанных строк.
+    Счетчик не опускается ниже нуля даже при рассинхронизации.
+    values записываются тем же UPDATE.
+    """
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0) for field in fields
+    }, **values)
+
+
+def counted_fields(model):
+    """Поля связи model, по которым строка учитывается в счетчиках."""
+    return {
+        related_field
+        for _, _, related_name, related_field in COUNTERS
+        if related_name == model._meta.label
+    }
+
+
+def shift_row_counters(instance, delta, **values):
+    """Сдвигает на delta счетчики, в которых учитывается строка instance
+    (добавление и удаление по одной строке: админка, каскадное
+    удаление). values записываются в те же UPDATE."""
+    for model_name, field, related_name, related_field in COUNTERS:
+        if related_name == instance._meta.label:
+            shift_counters(
+                apps.get_model(model_name).objects.filter(
+                    pk=getattr(instance, f"{related_field}_id")
+                ),
+                delta,
+                field,
+                **values,
+            )
+
+
+def actual_count(related_model, related_field):
+    """Подзапрос с фактическим числом связанных строк."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef("pk")})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def recount(dry_run=False):
+    """Исправляет расхождения счетчиков с фактическими данными.
+
+    Возвращает словарь ``{"Модель.поле": число исправленных строк}``.
+    При ``dry_run`` только считает расхождения.
+    """
+    drift = {}
+    for model_name, field, related_name, related_field in COUNTERS:
+        model = apps.get_model(model_name)
+        actual = actual_count(apps.get_model(related_name), related_field)
+        drifted = model.objects.alias(actual=actual).exclude(
+            **{field: F("actual")}
+        )
+        drift[f"{model.__name__}.{field}"] = (
+            drifted.count() if dry_run else drifted.update(**{field: actual})
+        )
+    return drift
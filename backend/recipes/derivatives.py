@@ -0,0 +1,168 @@
+"""Уменьшенные копии загруженных изображений (WebP и JPEG).
+
+Копии строятся после фиксации транзакции в пуле из
+IMAGE_DERIVATIVE_WORKERS потоков, не задерживая ответ. Имя копии содержит
+хэш исходного файла, поэтому при замене картинки меняется и адрес копии,
+а nginx может отдавать /media/derivatives/ с неограниченным кэшированием.
+Если очередь пула заполнена или IMAGE_DERIVATIVES_ENABLED выключен,
+задача пропускается - копии можно достроить командой
+build_image_derivatives.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+# Формат: (расширение, параметры сохранения Pillow).
+FORMATS = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"format": "JPEG", "quality": 82, "optimize": True}),
+}
+# Фон для JPEG у картинок с прозрачностью.
+JPEG_BACKGROUND = (255, 255, 255)
+
+executor = None
+executor_lock = threading.Lock()
+queue_slots = threading.BoundedSemaphore(settings.IMAGE_DERIVATIVE_QUEUE)
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                thread_name_prefix="image-derivatives",
+            )
+        return executor
+
+
+def needs_derivatives(instance, field_name, derivatives_field):
+    image = getattr(instance, field_name)
+    derivatives = getattr(instance, derivatives_field) or {}
+    if not image:
+        return bool(derivatives)
+    return derivatives.get("source") != image.name
+
+
+def schedule(instance, field_name, derivatives_field):
+    """Ставит построение копий в очередь после фиксации транзакции."""
+    if not settings.IMAGE_DERIVATIVES_ENABLED:
+        return
+    model = type(instance)
+    source = getattr(instance, field_name).name or ""
+
+    def submit():
+        if not queue_slots.acquire(blocking=False):
+            logger.warning(
+                "Очередь копий изображений заполнена, пропущено: %s", source
+            )
+            return
+        try:
+            future = get_executor().submit(
+                run, model, instance.pk, field_name, derivatives_field, source
+            )
+        except RuntimeError:
+            queue_slots.release()
+            raise
+        future.add_done_callback(lambda future: queue_slots.release())
+
+    transaction.on_commit(submit)
+
+
+def run(model, pk, field_name, derivatives_field, source):
+    try:
+        store(model, pk, field_name, derivatives_field, source)
+    except Exception:
+        logger.exception("Не удалось построить копии изображения %s", source)
+    finally:
+        close_old_connections()
+
+
+def store(model, pk, field_name, derivatives_field, source):
+    """Строит копии и сохраняет их имена, если картинка не сменилась."""
+    if source:
+        derivatives = build(source)
+        unchanged = Q(**{field_name: source})
+    else:
+        derivatives = {}
+        unchanged = Q(**{field_name: ""}) | Q(
+            **{f"{field_name}__isnull": True}
+        )
+    model.objects.filter(unchanged, pk=pk).update(
+        **{derivatives_field: derivatives}
+    )
+    return derivatives
+
+
+def build(source):
+    """Строит копии файла source во всех размерах и форматах.
+
+    Возвращает ``{"source": имя, ширина: {формат: имя копии}}``.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    derivatives = {"source": source}
+    with Image.open(BytesIO(content)) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in settings.IMAGE_DERIVATIVE_WIDTHS:
+            image = original.copy()
+            # thumbnail не увеличивает картинку меньше заданной ширины.
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            derivatives[str(width)] = {
+                name: save(image, digest, width, extension, options)
+                for name, (extension, options) in FORMATS.items()
+            }
+    return derivatives
+
+
+def save(image, digest, width, extension, options):
+    name = f"{DERIVATIVES_DIR}/{digest[:2]}/{digest}-{width}.{extension}"
+    if default_storage.exists(name):
+        return name
+    if options["format"] == "JPEG":
+        image = flatten(image)
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def flatten(image):
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, JPEG_BACKGROUND)
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def get_urls(derivatives, request=None):
+    """Адреса копий: ``{ширина: {формат: url}}``."""
+    urls = {}
+    for width, names in (derivatives or {}).items():
+        if width == "source":
+            continue
+        urls[width] = {}
+        for name, path in names.items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[width][name] = url
+    return urls
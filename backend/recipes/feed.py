@@ -0,0 +1,238 @@
+"""Ленты подписок: рецепты авторов, на которых подписан пользователь.
+
+Лента хранится в FeedEntry и заполняется при записи: новый рецепт
+копируется в ленты всех подписчиков автора, при подписке в ленту
+добавляются последние рецепты автора, при отписке - удаляются. В ленте
+остается не больше FEED_MAX_LENGTH последних рецептов.
+
+Рецепты авторов, у которых больше FEED_FANOUT_MAX_SUBSCRIBERS
+подписчиков, в ленты не копируются: при чтении (Timeline) страница
+сохраненной ленты, прочитанная по индексу (user, -creation_date),
+сливается с последними рецептами таких авторов. Когда число подписчиков
+автора переходит через порог, его рецепты добавляются в ленты
+подписчиков или удаляются из них (subscribers_changed).
+"""
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from .models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+
+
+def is_pulled(author):
+    """Рецепты автора выбираются при чтении, а не копируются в ленты."""
+    return author.subscribers_count > settings.FEED_FANOUT_MAX_SUBSCRIBERS
+
+
+def entry(user_id, recipe):
+    return FeedEntry(
+        user_id=user_id,
+        recipe_id=recipe.id,
+        author_id=recipe.author_id,
+        creation_date=recipe.creation_date,
+    )
+
+
+def subscriber_ids(author_id):
+    return list(
+        Subscription.objects.filter(author_id=author_id)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+
+
+def latest_recipes(author_id):
+    return list(Recipe.objects.filter(author_id=author_id).order_by(
+        "-creation_date", "-id"
+    ).only("id", "author_id", "creation_date")[:settings.FEED_MAX_LENGTH])
+
+
+def push(user_ids, recipes):
+    """Добавляет рецепты в ленты пользователей."""
+    FeedEntry.objects.bulk_create(
+        (
+            entry(user_id, recipe)
+            for user_id in user_ids for recipe in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        trim(user_ids[start:start + BATCH_SIZE])
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if is_pulled(recipe.author):
+        return
+    push(subscriber_ids(recipe.author_id), [recipe])
+
+
+def backfill(user_id, author):
+    """Добавляет в ленту пользователя последние рецепты автора."""
+    if is_pulled(author):
+        return
+    push([user_id], latest_recipes(author.pk))
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя рецепты автора."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def subscribers_changed(author_id, delta):
+    """Вызывается после сдвига subscribers_count автора на delta.
+
+    Если число подписчиков перешло через FEED_FANOUT_MAX_SUBSCRIBERS
+    вверх, рецепты автора удаляются из лент (теперь они читаются
+    напрямую), если вниз - добавляются в ленты всех подписчиков.
+    """
+    count = User.objects.filter(pk=author_id).values_list(
+        "subscribers_count", flat=True
+    ).first()
+    if count is None:
+        return
+    threshold = settings.FEED_FANOUT_MAX_SUBSCRIBERS
+    before = count - delta
+    if before <= threshold < count:
+        FeedEntry.objects.filter(author_id=author_id).delete()
+    elif count <= threshold < before:
+        push(subscriber_ids(author_id), latest_recipes(author_id))
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей FEED_MAX_LENGTH последних
+    рецептов, удаляя лишние одним запросом."""
+    numbered = FeedEntry.objects.filter(user_id__in=user_ids).order_by(
+    ).annotate(
+        feed_rank=Window(
+            expression=RowNumber(),
+            partition_by=F("user_id"),
+            order_by=(F("creation_date").desc(), F("recipe_id").desc()),
+        )
+    ).values("id", "feed_rank")
+    sql, params = numbered.query.sql_with_params()
+    FeedEntry.objects.filter(id__in=RawSQL(
+        f"SELECT numbered.id FROM ({sql}) numbered "
+        "WHERE numbered.feed_rank > %s",
+        (*params, settings.FEED_MAX_LENGTH),
+    )).delete()
+
+
+def rebuild(user_ids=None):
+    """Заново собирает ленты пользователей user_ids (по умолчанию всех).
+
+    Возвращает число пользователей.
+    """
+    users = User.objects.order_by("pk").values_list("pk", flat=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    count = 0
+    for user_id in users.iterator():
+        recipes = Recipe.objects.filter(
+            author__subscribers__user_id=user_id,
+            author__subscribers_count__lte=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            ),
+        ).order_by("-creation_date", "-id").only(
+            "id", "author_id", "creation_date"
+        )[:settings.FEED_MAX_LENGTH]
+        with transaction.atomic():
+            FeedEntry.objects.filter(user_id=user_id).delete()
+            FeedEntry.objects.bulk_create(
+                (entry(user_id, recipe) for recipe in recipes),
+                batch_size=BATCH_SIZE,
+            )
+        count += 1
+    return count
+
+
+def pulled_authors(user_id):
+    """Авторы из подписок пользователя, рецепты которых читаются
+    напрямую."""
+    return Subscription.objects.filter(
+        user_id=user_id,
+        author__subscribers_count__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS,
+    ).values("author_id")
+
+
+class Timeline:
+    """Лента пользователя, новые рецепты первыми.
+
+    Ведет себя как упорядоченный QuerySet рецептов для пагинаторов:
+    поддерживает count() и срезы, after() продолжает ленту после позиции
+    (creation_date, id). Срез читает по stop ключей из FeedEntry и из
+    рецептов авторов с большим числом подписчиков, сливает их и загружает
+    рецепты страницы из recipes (QuerySet с фильтрами и аннотациями
+    списка).
+    """
+
+    model = Recipe
+    ordered = True
+
+    def __init__(self, user_id, recipes, position=None):
+        self.user_id = user_id
+        self.recipes = recipes
+        self.position = position
+
+    def after(self, position):
+        return Timeline(self.user_id, self.recipes, position)
+
+    def order_by(self, *fields):
+        # Порядок ленты фиксирован: (-creation_date, -id).
+        return self
+
+    def sources(self):
+        """Ключи (creation_date, id) сохраненной ленты и рецептов
+        авторов, которые читаются напрямую."""
+        entries = FeedEntry.objects.filter(user_id=self.user_id)
+        if self.recipes.query.where:
+            entries = entries.filter(recipe__in=self.recipes.values("pk"))
+        pulled = self.recipes.filter(
+            author_id__in=pulled_authors(self.user_id)
+        )
+        if self.position is not None:
+            date, recipe_id = self.position
+            entries = entries.filter(
+                Q(creation_date__lt=date)
+                | Q(creation_date=date, recipe_id__lt=recipe_id)
+            )
+            pulled = pulled.filter(
+                Q(creation_date__lt=date)
+                | Q(creation_date=date, id__lt=recipe_id)
+            )
+        return (
+            entries.order_by("-creation_date", "-recipe_id").values_list(
+                "creation_date", "recipe_id"
+            ),
+            pulled.order_by("-creation_date", "-id").values_list(
+                "creation_date", "id"
+            ),
+        )
+
+    def count(self):
+        return sum(source.count() for source in self.sources())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        keys = merge(
+            *(source[:stop] for source in self.sources()), reverse=True
+        )
+        ids = list(islice(
+            dict.fromkeys(recipe_id for _, recipe_id in keys), start, stop
+        ))
+        recipes = self.recipes.order_by().in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
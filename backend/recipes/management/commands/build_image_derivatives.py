@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from recipes.derivatives import needs_derivatives, store
+from recipes.signals import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит недостающие уменьшенные копии картинок рецептов "
+        "и аватаров пользователей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить копии для всех картинок.",
+        )
+
+    def handle(self, *args, **options):
+        for model, (field_name, derivatives_field) in IMAGE_FIELDS.items():
+            built = 0
+            instances = model.objects.only(
+                "pk", field_name, derivatives_field
+            ).order_by("pk")
+            for instance in instances.iterator():
+                if not (
+                    options["force"]
+                    or needs_derivatives(
+                        instance, field_name, derivatives_field
+                    )
+                ):
+                    continue
+                source = getattr(instance, field_name).name or ""
+                try:
+                    store(
+                        model, instance.pk, field_name, derivatives_field,
+                        source,
+                    )
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f"{source}: {error}")
+                    continue
+                built += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: обработано {built}"
+            ))
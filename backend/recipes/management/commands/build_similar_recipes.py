@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similar import update_similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Считает похожие рецепты для рецептов, измененных после прошлого "
+        "запуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Пересчитать похожие рецепты для всех рецептов.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано рецептов: {update_similar(full=options['full'])}"
+        ))
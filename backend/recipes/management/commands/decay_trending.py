@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import decay
+
+
+class Command(BaseCommand):
+    help = (
+        "Уменьшает счета популярности рецептов. Запускается по расписанию, "
+        "--hours - интервал между запусками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=1,
+            help="Сколько часов прошло с прошлого запуска (по умолчанию 1).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено рецептов: {decay(options['hours'])}"
+        ))
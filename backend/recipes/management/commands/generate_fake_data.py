@@ -0,0 +1,185 @@
+import random
+from base64 import b64decode
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import feed
+from recipes.counters import recount
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_index
+from recipes.shopping_cart import verify
+from recipes.similar import update_similar
+from recipes.trending import seed_from_counters
+from users.models import Subscription, User
+
+USERNAME_PREFIX = "bench_user_"
+EMAIL_DOMAIN = "bench.foodgram.local"
+PASSWORD = "bench-password-1"
+IMAGE_NAME = "recipes/images/bench.png"
+# Картинка 1x1 PNG, общая для всех сгенерированных рецептов.
+IMAGE = b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8"
+    "/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
+)
+WORDS = (
+    "суп", "салат", "пирог", "каша", "рагу", "запеканка", "омлет", "соус",
+    "домашний", "быстрый", "летний", "острый", "сладкий", "постный",
+    "с курицей", "с грибами", "с сыром", "по-деревенски", "на гриле",
+)
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует воспроизводимый набор тестовых данных для нагрузочных "
+        "замеров: пользователей, рецепты, избранное, списки покупок и "
+        "подписки на основе справочников из data/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes-per-user", type=int, default=5)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--cart-per-user", type=int, default=5)
+        parser.add_argument("--subscriptions-per-user", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Удалить ранее сгенерированных пользователей и их данные.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).delete()
+            self.stdout.write(f"Удалено объектов: {deleted}")
+        if not Tag.objects.exists():
+            call_command("add_tags", verbosity=0)
+        if not Ingredient.objects.exists():
+            call_command("add_ingredients", verbosity=0)
+        if not default_storage.exists(IMAGE_NAME):
+            default_storage.save(IMAGE_NAME, ContentFile(IMAGE))
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            users = self.create_users(options)
+            recipes = self.create_recipes(rng, users, options)
+            self.create_relations(rng, users, recipes, options)
+            recount()
+            seed_from_counters(
+                Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+            )
+            update_search_index(recipe.pk for recipe in recipes)
+            verify([user.pk for user in users], fix=True)
+            feed.rebuild([user.pk for user in users])
+            update_similar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано пользователей: {len(users)}, рецептов: {len(recipes)}"
+        ))
+
+    def create_users(self, options):
+        password = make_password(PASSWORD)
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        users = [
+            User(
+                username=f"{USERNAME_PREFIX}{number}",
+                email=f"{USERNAME_PREFIX}{number}@{EMAIL_DOMAIN}",
+                first_name="Тест",
+                last_name="Тестов",
+                password=password,
+            )
+            for number in range(start, start + options["users"])
+        ]
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        return list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).order_by("pk"))
+
+    def create_recipes(self, rng, users, options):
+        tags = list(Tag.objects.order_by("pk"))
+        ingredient_ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        recipe_tags = [
+            rng.sample(tags, rng.randint(1, 3))
+            for _ in range(len(users) * options["recipes_per_user"])
+        ]
+        recipes = [
+            Recipe(
+                author=user,
+                name=" ".join(rng.sample(WORDS, 3)).capitalize(),
+                text=" ".join(rng.choices(WORDS, k=40)),
+                image=IMAGE_NAME,
+                cooking_time=rng.randint(5, 180),
+            )
+            for user in users
+            for _ in range(options["recipes_per_user"])
+        ]
+        for recipe, tags in zip(recipes, recipe_tags):
+            recipe.tags_mask = Recipe.get_tags_mask(tags)
+        Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+        recipes = list(
+            Recipe.objects.filter(author__in=users).order_by("pk")
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+                for recipe, tags in zip(recipes, recipe_tags)
+                for tag in tags
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        per_recipe = min(
+            options["ingredients_per_recipe"], len(ingredient_ids)
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in rng.sample(ingredient_ids, per_recipe)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return recipes
+
+    def create_relations(self, rng, users, recipes, options):
+        for model, per_user in (
+            (Favorite, options["favorites_per_user"]),
+            (ShoppingCart, options["cart_per_user"]),
+        ):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user.pk, recipe_id=recipe.pk)
+                    for user in users
+                    for recipe in rng.sample(
+                        recipes, min(per_user, len(recipes))
+                    )
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        Subscription.objects.bulk_create(
+            (
+                Subscription(user_id=user.pk, author_id=author.pk)
+                for user in users
+                for author in rng.sample(
+                    users,
+                    min(options["subscriptions_per_user"] + 1, len(users)),
+                )
+                if author.pk != user.pk
+            ),
+            batch_size=BATCH_SIZE,
+        )
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.catalog_loader import BATCH_SIZE, CATALOGS, load_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает справочник ингредиентов или тегов из CSV или JSON: "
+        "новые строки добавляются, измененные обновляются, повторная "
+        "загрузка ничего не меняет."
+    )
+    # Справочник, который загружают команды-обертки (add_tags и т.п.).
+    catalog = None
+
+    def add_arguments(self, parser):
+        if self.catalog is None:
+            parser.add_argument("catalog", choices=sorted(CATALOGS))
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="Файл справочника (по умолчанию data/<справочник>.csv).",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("csv", "json"),
+            help="Формат файла (по умолчанию по расширению).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Строк в порции (по умолчанию {BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Показать изменения, не сохраняя их.",
+        )
+
+    def handle(self, *args, **options):
+        catalog = self.catalog or options["catalog"]
+        path = options["path"] or settings.BASE_DIR / f"data/{catalog}.csv"
+        try:
+            report = load_catalog(
+                catalog,
+                path,
+                file_format=options["format"],
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        if options["dry_run"] or options["verbosity"] > 1:
+            for sign, change in report.changes:
+                self.stdout.write(f"{sign} {change}")
+        for error in report.errors:
+            self.stderr.write(f"Пропущено: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            "{}{}: добавлено {inserted}, обновлено {updated}, без "
+            "изменений {unchanged}, пропущено {skipped}.".format(
+                "[dry-run] " if options["dry_run"] else "",
+                str(CATALOGS[catalog].model._meta.verbose_name_plural),
+                **report.counts,
+            )
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Заново собирает ленты подписок, например после изменения "
+        "FEED_MAX_LENGTH или FEED_FANOUT_MAX_SUBSCRIBERS."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f"Собрано лент: {rebuild()}"
+        ))
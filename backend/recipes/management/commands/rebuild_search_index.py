@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import BATCH_SIZE, clear_search_index, update_search_index
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает поисковый индекс всех рецептов."
+
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        clear_search_index()
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            with transaction.atomic():
+                update_search_index(recipe_ids[start:start + BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(
+            f"Проиндексировано рецептов: {len(recipe_ids)}"
+        ))
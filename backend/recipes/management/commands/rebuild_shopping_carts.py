@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingCart, ShoppingCartIngredient
+from recipes.shopping_cart import verify
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет суммы ингредиентов списков покупок с рецептами "
+        "и исправляет расхождения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить, ничего не исправляя.",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = sorted(
+            set(ShoppingCart.objects.values_list("user_id", flat=True))
+            | set(
+                ShoppingCartIngredient.objects.values_list(
+                    "user_id", flat=True
+                )
+            )
+        )
+        mismatches = 0
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            with transaction.atomic():
+                mismatches += verify(
+                    user_ids[start:start + BATCH_SIZE],
+                    fix=not options["check"],
+                )
+        style = self.style.WARNING if mismatches else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Пользователей: {len(user_ids)}, расхождений: {mismatches}"
+        ))
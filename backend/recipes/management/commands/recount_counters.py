@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики избранного, покупок, рецептов и подписок."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать расхождения, ничего не исправляя.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = recount(dry_run=options["dry_run"])
+        for counter, rows in drift.items():
+            style = self.style.WARNING if rows else self.style.SUCCESS
+            self.stdout.write(style(f"{counter}: расхождений {rows}"))
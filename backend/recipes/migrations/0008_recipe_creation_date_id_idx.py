@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_auto_20240921_0857'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-creation_date', '-id'], name='recipe_creation_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:57
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Состояние поиска на момент миграции: SQL скопирован из recipes.search,
+# чтобы последующие изменения модуля не меняли эту миграцию.
+FTS_TABLE = 'recipes_recipe_fts'
+PG_UPDATE = """
+UPDATE recipes_recipe AS recipe SET search_vector =
+    setweight(to_tsvector(%s::regconfig, coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector(%s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS item
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = item.ingredient_id
+        WHERE item.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, coalesce(recipe.text, '')), 'C')
+"""
+FTS_INSERT = """
+INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+SELECT recipe.id, recipe.name, coalesce((
+    SELECT group_concat(ingredient.name, ' ')
+    FROM recipes_recipeingredient AS item
+    JOIN recipes_ingredient AS ingredient
+        ON ingredient.id = item.ingredient_id
+    WHERE item.recipe_id = recipe.id
+), ''), recipe.text
+FROM recipes_recipe AS recipe
+"""
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        config = settings.SEARCH_CONFIG
+        schema_editor.execute(PG_UPDATE, (config, config, config))
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, ingredients, text, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(FTS_INSERT)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    """Собирает ленты по существующим подпискам."""
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    user_ids = Subscription.objects.order_by('user_id').values_list(
+        'user_id', flat=True
+    ).distinct()
+    for user_id in user_ids.iterator():
+        recipes = Recipe.objects.filter(
+            author__subscribers__user_id=user_id,
+            author__subscribers_count__lte=(
+                settings.FEED_FANOUT_MAX_SUBSCRIBERS
+            ),
+        ).order_by('-creation_date', '-id').values_list(
+            'id', 'author_id', 'creation_date'
+        )[:settings.FEED_MAX_LENGTH]
+        FeedEntry.objects.bulk_create(
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                creation_date=creation_date,
+            )
+            for recipe_id, author_id, creation_date in recipes
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0013_recipe_image_derivatives'),
+        ('users', '0006_user_avatar_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(verbose_name='Рецепт создан')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-creation_date', '-recipe'], name='feed_user_creation_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='Рецепт уже есть в ленте'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from .constants import (
     INGREDIENT_MAX_LENGTH,
@@ -10,10 +15,11 @@ from .constants import (
     MIN_COOKING_TIME,
     MIN_INGEDIENT_AMOUNT,
     SLUG_MAX_LENGTH,
+    TAG_BITS,
     TAG_MAX_LENGTH,
     UNIT_MAX_LENGTH
 )
-from users.models import User
+from users.models import DenormalizedFieldsMixin, User
 
 
 class Tag(models.Model):
@@ -21,6 +27,9 @@ class Tag(models.Model):
 
     name = models.CharField("Тег", max_length=TAG_MAX_LENGTH, unique=True)
     slug = models.SlugField("Слаг", max_length=SLUG_MAX_LENGTH, unique=True)
+    bit = models.PositiveSmallIntegerField(
+        "Бит в маске тегов", unique=True, null=True, editable=False
+    )
 
     class Meta:
         ordering = ("id",)
@@ -30,6 +39,38 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @staticmethod
+    def free_bits():
+        """Свободные биты маски по возрастанию."""
+        taken = set(
+            Tag.objects.filter(bit__isnull=False).values_list("bit", flat=True)
+        )
+        return [bit for bit in range(TAG_BITS) if bit not in taken]
+
+    @staticmethod
+    def free_bit():
+        """Наименьший свободный бит маски или None."""
+        return next(iter(Tag.free_bits()), None)
+
+    def clean(self):
+        if self.bit is None and self.free_bit() is None:
+            raise ValidationError(
+                f"Нельзя создать больше {TAG_BITS} тегов"
+            )
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = self.free_bit()
+            if self.bit is None:
+                raise ValidationError(
+                    f"Нельзя создать больше {TAG_BITS} тегов"
+                )
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Модель для ингредиентов."""
@@ -56,7 +97,44 @@ class Ingredient(models.Model):
         return f"{self.name}, {self.measurement_unit}"
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам."""
+
+    def with_tags(self, tags, match_all=False):
+        """Рецепты хотя бы с одним (или со всеми) из тегов tags.
+
+        Проверяется маска tags_mask, без соединения с таблицей тегов.
+        """
+        mask = self.model.get_tags_mask(tags)
+        if not mask:
+            return self
+        matched = self.alias(matched_tags=F("tags_mask").bitand(mask))
+        if match_all:
+            return matched.filter(matched_tags=mask)
+        return matched.filter(matched_tags__gt=0)
+
+    def latest_per_author(self, limit):
+        """Не больше limit последних рецептов каждого автора.
+
+        Рецепты нумеруются ROW_NUMBER() в разрезе автора, поэтому выборка
+        для любого числа авторов делается одним запросом.
+        """
+        numbered = self.order_by().annotate(
+            author_rank=Window(
+                expression=RowNumber(),
+                partition_by=F("author_id"),
+                order_by=(F("creation_date").desc(), F("id").desc()),
+            )
+        ).values("id", "author_rank")
+        sql, params = numbered.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f"SELECT numbered.id FROM ({sql}) numbered "
+            "WHERE numbered.author_rank <= %s",
+            (*params, limit),
+        ))
+
+
+class Recipe(DenormalizedFieldsMixin, models.Model):
     """Модель для рецепта."""
 
     author = models.ForeignKey(
@@ -66,6 +144,7 @@ class Recipe(models.Model):
     )
 
     creation_date = models.DateTimeField("Создан", auto_now_add=True)
+    updated = models.DateTimeField("Изменен", auto_now=True)
 
     name = models.CharField("Название", max_length=MAX_LENGTH)
     text = models.TextField("Процесс приготовления")
@@ -87,16 +166,76 @@ class Recipe(models.Model):
             ),
         ],
     )
+    favorites_count = models.PositiveIntegerField(
+        "Число добавлений в избранное", default=0, editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        "Число добавлений в список покупок", default=0, editable=False
+    )
+    # Меняется в recipes.trending.
+    trending_score = models.FloatField(
+        "Популярность за последнее время", default=0, editable=False
+    )
+    # Заполняется в recipes.derivatives после загрузки картинки.
+    image_derivatives = models.JSONField(
+        "Уменьшенные копии картинки", default=dict, editable=False
+    )
+    # Бит Tag.bit установлен для каждого тега рецепта.
+    tags_mask = models.BigIntegerField(
+        "Маска тегов", default=0, editable=False
+    )
+    # Время, на которое посчитаны похожие рецепты (recipes.similar).
+    similar_updated = models.DateTimeField(
+        "Похожие рецепты посчитаны", null=True, editable=False
+    )
+    # Заполняется в recipes.search; в SQLite не используется (FTS5).
+    search_vector = SearchVectorField(
+        "Поисковый вектор", null=True, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    denormalized_fields = (
+        "favorites_count",
+        "shopping_cart_count",
+        "trending_score",
+        "image_derivatives",
+        "tags_mask",
+        "similar_updated",
+        "search_vector",
+    )
 
     class Meta:
         ordering = ("-creation_date",)
         default_related_name = "recipes"
+        indexes = (
+            models.Index(
+                fields=("-creation_date", "-id"),
+                name="recipe_creation_date_id_idx",
+            ),
+            models.Index(
+                fields=("-trending_score", "-id"),
+                name="recipe_trending_score_id_idx",
+            ),
+        )
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def get_tags_mask(tags):
+        mask = 0
+        for tag in tags:
+            mask |= tag.mask
+        return mask
+
+    def refresh_tags_mask(self):
+        """Пересчитывает маску по сохраненным тегам рецепта."""
+        self.tags_mask = self.get_tags_mask(self.tags.all())
+        Recipe.objects.filter(pk=self.pk).update(tags_mask=self.tags_mask)
+
 
 class RecipeIngredient(models.Model):
     """Модель для ингредиента рецепта."""
@@ -193,3 +332,115 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f"{self.recipe.name!r}" " в списке покупок "
                 f"{self.user.username!r}")
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при добавлении и удалении рецептов из списка покупок
+    и при изменении ингредиентов рецептов (см. recipes.shopping_cart).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name="Ингредиент"
+    )
+    amount = models.PositiveIntegerField("Количество")
+
+    class Meta:
+        default_related_name = "shopping_cart_ingredients"
+        verbose_name = "Ингредиент списка покупок"
+        verbose_name_plural = "Ингредиенты списка покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="Ингредиент уже учтен в списке покупок",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient} x {self.amount} у {self.user_id}"
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Строки добавляются при публикации рецепта для подписчиков автора
+    и при подписке (см. recipes.feed), лента ограничена FEED_MAX_LENGTH
+    последними рецептами. Рецепты авторов с большим числом подписчиков
+    в ленты не копируются и выбираются при чтении.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Подписчик",
+        related_name="feed_entries",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+        related_name="feed_entries",
+    )
+    # Копии полей рецепта: удаление по автору и обрезка ленты без JOIN.
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name="Автор",
+        related_name="+",
+    )
+    creation_date = models.DateTimeField("Рецепт создан")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="Рецепт уже есть в ленте"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-creation_date", "-recipe"),
+                name="feed_user_creation_date_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} в ленте {self.user_id}"
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт (по ингредиентам и тегам), см. recipes.similar."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+        related_name="similar_recipes",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name="Похожий рецепт",
+        related_name="similar_to",
+    )
+    score = models.FloatField("Сходство")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "similar"),
+                name="Похожий рецепт уже учтен",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}: {self.score:.2f}"
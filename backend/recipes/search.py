@@ -0,0 +1,131 @@
+"""Полнотекстовый поиск рецептов по названию, ингредиентам и описанию.
+
+В PostgreSQL поисковый вектор хранится в Recipe.search_vector (индекс
+GIN), в SQLite - во внешней таблице FTS5 с rowid, равным id рецепта.
+Индекс обновляется при сохранении рецепта вместе с ингредиентами; для
+полного пересчета есть команда rebuild_search_index.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+BATCH_SIZE = 500
+FTS_TABLE = "recipes_recipe_fts"
+# Веса полей: название, ингредиенты, описание.
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+PG_UPDATE = """
+UPDATE recipes_recipe AS recipe SET search_vector =
+    setweight(to_tsvector(%s::regconfig, coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector(%s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS item
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = item.ingredient_id
+        WHERE item.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, coalesce(recipe.text, '')), 'C')
+WHERE recipe.id = ANY(%s)
+"""
+FTS_DELETE = "DELETE FROM {table} WHERE rowid IN ({ids})"
+FTS_INSERT = """
+INSERT INTO {table} (rowid, name, ingredients, text)
+SELECT recipe.id, recipe.name, coalesce((
+    SELECT group_concat(ingredient.name, ' ')
+    FROM recipes_recipeingredient AS item
+    JOIN recipes_ingredient AS ingredient
+        ON ingredient.id = item.ingredient_id
+    WHERE item.recipe_id = recipe.id
+), ''), recipe.text
+FROM recipes_recipe AS recipe WHERE recipe.id IN ({ids})
+"""
+
+
+def update_search_index(recipe_ids, using=connection):
+    """Пересчитывает поисковые данные рецептов recipe_ids."""
+    recipe_ids = list(recipe_ids)
+    with using.cursor() as cursor:
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            if using.vendor == "postgresql":
+                config = settings.SEARCH_CONFIG
+                cursor.execute(PG_UPDATE, (config, config, config, batch))
+            elif using.vendor == "sqlite":
+                ids = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    FTS_DELETE.format(table=FTS_TABLE, ids=ids), batch
+                )
+                cursor.execute(
+                    FTS_INSERT.format(table=FTS_TABLE, ids=ids), batch
+                )
+
+
+def remove_from_search_index(recipe_ids, using=connection):
+    """Удаляет рецепты из таблицы FTS5 (в PostgreSQL вектор удаляется
+    вместе со строкой рецепта)."""
+    recipe_ids = list(recipe_ids)
+    if using.vendor != "sqlite" or not recipe_ids:
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            FTS_DELETE.format(
+                table=FTS_TABLE, ids=", ".join(["%s"] * len(recipe_ids))
+            ),
+            recipe_ids,
+        )
+
+
+def clear_search_index(using=connection):
+    """Очищает таблицу FTS5 от всех строк, в том числе оставшихся от
+    удаленных рецептов."""
+    if using.vendor == "sqlite":
+        with using.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+
+def fts_query(text):
+    """Запрос FTS5: все слова обязательны, каждое ищется как префикс."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def search_recipes(queryset, text):
+    """Отбирает рецепты по запросу и сортирует по релевантности."""
+    if not text.strip():
+        return queryset
+    if connection.vendor == "postgresql":
+        query = SearchQuery(
+            text, config=settings.SEARCH_CONFIG, search_type="websearch"
+        )
+        # ts_rank возвращает real; double precision без потерь проходит
+        # через курсор KeysetPagination.
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(
+                SearchRank(F("search_vector"), query), FloatField()
+            )
+        ).order_by("-search_rank", "-creation_date", "-id")
+    if connection.vendor == "sqlite":
+        query = fts_query(text)
+        if not query:
+            return queryset.none()
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        # bm25 тем меньше, чем лучше совпадение.
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id",
+            (query,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (query,),
+        )).annotate(search_rank=rank).order_by(
+            "-search_rank", "-creation_date", "-id"
+        )
+    return queryset.filter(
+        Q(name__icontains=text) | Q(text__icontains=text)
+    )
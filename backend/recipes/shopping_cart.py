@@ -0,0 +1,136 @@
+"""Поддержка сумм ингредиентов в списках покупок (ShoppingCartIngredient).
+
+Суммы меняются в той же транзакции, что и список покупок или состав
+рецепта. Перед изменением блокируются строки затронутых пользователей
+(всегда в порядке id), поэтому параллельные изменения списка одного
+пользователя выполняются по очереди и не теряют слагаемые. Изменения в
+админке и каскадные удаления учитываются в recipes.admin и
+recipes.signals.
+"""
+from collections import defaultdict
+
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartIngredient
+from users.models import User
+
+
+def recipe_amounts(recipe_ids):
+    """Суммы ингредиентов рецептов: ``{id ингредиента: количество}``."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_id", "total")
+    )
+
+
+def negate(amounts):
+    return {ingredient: -amount for ingredient, amount in amounts.items()}
+
+
+def change_totals(user_ids, deltas):
+    """Прибавляет deltas ``{id ингредиента: изменение}`` к суммам
+    каждого из пользователей user_ids.
+
+    Вызывается внутри transaction.atomic().
+    """
+    deltas = {
+        ingredient: delta for ingredient, delta in deltas.items() if delta
+    }
+    user_ids = sorted(set(user_ids))
+    if not deltas or not user_ids:
+        return
+    list(
+        User.objects.select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    existing = {
+        (row.user_id, row.ingredient_id): row
+        for row in ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            row = existing.get((user_id, ingredient_id))
+            if row is None:
+                if delta > 0:
+                    to_create.append(ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=delta,
+                    ))
+                continue
+            row.amount += delta
+            if row.amount > 0:
+                to_update.append(row)
+            else:
+                to_delete.append(row.pk)
+    ShoppingCartIngredient.objects.bulk_create(to_create)
+    ShoppingCartIngredient.objects.bulk_update(to_update, ("amount",))
+    ShoppingCartIngredient.objects.filter(pk__in=to_delete).delete()
+
+
+def cart_users(recipe_id):
+    """id пользователей, у которых рецепт в списке покупок."""
+    return ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        "user_id", flat=True
+    )
+
+
+def live_totals(user_ids):
+    """Суммы, посчитанные напрямую по спискам покупок и рецептам."""
+    totals = defaultdict(dict)
+    rows = (
+        RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user_id__in=user_ids
+        )
+        .order_by()
+        .values("recipe__shopping_cart__user_id", "ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list(
+            "recipe__shopping_cart__user_id", "ingredient_id", "total"
+        )
+    )
+    for user_id, ingredient_id, total in rows:
+        totals[user_id][ingredient_id] = total
+    return totals
+
+
+def stored_totals(user_ids):
+    totals = defaultdict(dict)
+    rows = ShoppingCartIngredient.objects.filter(
+        user_id__in=user_ids
+    ).values_list("user_id", "ingredient_id", "amount")
+    for user_id, ingredient_id, amount in rows:
+        totals[user_id][ingredient_id] = amount
+    return totals
+
+
+def verify(user_ids, fix=False):
+    """Сравнивает сохраненные суммы с фактическими.
+
+    Возвращает число расхождений (строк), при fix - исправляет их.
+    """
+    live = live_totals(user_ids)
+    stored = stored_totals(user_ids)
+    mismatches = 0
+    for user_id in user_ids:
+        expected, actual = live.get(user_id, {}), stored.get(user_id, {})
+        deltas = {
+            ingredient: expected.get(ingredient, 0)
+            - actual.get(ingredient, 0)
+            for ingredient in expected.keys() | actual.keys()
+        }
+        deltas = {
+            ingredient: delta for ingredient, delta in deltas.items() if delta
+        }
+        mismatches += len(deltas)
+        if fix and deltas:
+            change_totals([user_id], deltas)
+    return mismatches
@@ -0,0 +1,116 @@
+"""Битовая карта id существующих рецептов для коротких ссылок.
+
+Каждый процесс держит карту в памяти (бит на id, около 125 КБ на
+миллион id), поэтому ссылки на несуществующие рецепты отклоняются без
+запроса к базе. Карта обновляется сигналами при создании и удалении
+рецептов в этом процессе и перестраивается раз в SHORT_LINK_BITMAP_TTL
+секунд. Id больше наибольшего id при построении карты считаются
+неизвестными и проверяются запросом, поэтому рецепты, созданные в
+других процессах, не теряются.
+
+Удаление рецепта меняет общее поколение карт (SharedVersion), и карты
+всех процессов перестраиваются не позже чем через SHARED_VERSION_TTL.
+По поколению же проверяются найденные ссылки в кэше процесса.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+
+from .models import Recipe
+from .versions import SharedVersion
+
+SHORT_LINKS_VERSION_KEY = "short-links-version"
+
+
+class RecipeIdBitmap:
+    """Множество id рецептов одного процесса."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        # (биты, limit, удаленные id не меньше limit): про остальные id
+        # не меньше limit карта ничего не знает. Заменяется одним
+        # присваиванием.
+        self.state = (bytearray(), 0, set())
+        self.built_at = None
+        self.generation = SharedVersion(SHORT_LINKS_VERSION_KEY)
+        # Поколение, в котором построена карта.
+        self.version = None
+
+    def current(self, refresh=True):
+        """Текущее поколение; с refresh=False - без обращения к кэшу
+        (None, если копия поколения устарела)."""
+        if refresh:
+            return self.generation.get()
+        return self.generation.local()
+
+    def build(self):
+        # Поколение читается до id: удаление во время построения
+        # изменит его, и карта перестроится снова.
+        version = self.generation.get()
+        limit = (Recipe.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        bits = bytearray((limit + 7) // 8)
+        for recipe_id in Recipe.objects.filter(pk__lt=limit).values_list(
+            "pk", flat=True
+        ).iterator(chunk_size=10000):
+            bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        with self.lock:
+            self.state = (bits, limit, set())
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def warm(self):
+        """Строит карту при старте процесса, если база уже доступна."""
+        try:
+            self.build()
+        except DatabaseError:
+            self.built_at = None
+
+    def is_stale(self, refresh=True):
+        """Нужно ли перестроить карту; с refresh=False не обращается к
+        кэшу и считает карту устаревшей, если копия поколения
+        устарела."""
+        ttl = settings.SHORT_LINK_BITMAP_TTL if self.ttl is None else self.ttl
+        if self.built_at is None or time.monotonic() - self.built_at > ttl:
+            return True
+        version = self.current(refresh)
+        return version is None or version != self.version
+
+    def may_exist(self, recipe_id):
+        """False, если рецепта точно нет; True - рецепт может быть."""
+        if self.is_stale():
+            with self.build_lock:
+                if self.is_stale():
+                    self.build()
+        bits, limit, deleted = self.state
+        if recipe_id <= 0:
+            return False
+        if recipe_id >= limit:
+            return recipe_id not in deleted
+        return bool(bits[recipe_id >> 3] & (1 << (recipe_id & 7)))
+
+    def add(self, recipe_id):
+        with self.lock:
+            bits, limit, deleted = self.state
+            if 0 < recipe_id < limit:
+                bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+
+    def discard(self, recipe_id):
+        with self.lock:
+            bits, limit, deleted = self.state
+            if 0 < recipe_id < limit:
+                bits[recipe_id >> 3] &= ~(1 << (recipe_id & 7)) & 0xFF
+            elif recipe_id >= limit:
+                deleted.add(recipe_id)
+
+    def remove(self, recipe_id):
+        """Удаленный рецепт: сбрасывает карты и ссылки всех процессов."""
+        self.discard(recipe_id)
+        self.generation.bump()
+
+
+recipe_ids = RecipeIdBitmap()
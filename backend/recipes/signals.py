@@ -0,0 +1,114 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from . import derivatives
+from .catalog import bump_catalog_version
+from .counters import deletes_accounted, shift_row_counters
+from .feed import prune, subscribers_changed
+from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .search import remove_from_search_index, update_search_index
+from .shopping_cart import change_totals, negate, recipe_amounts
+from .short_links import recipe_ids
+from .trending import list_score_values
+from users.models import Subscription, User
+
+# Модель: (поле картинки, поле с копиями).
+IMAGE_FIELDS = {
+    Recipe: ("image", "image_derivatives"),
+    User: ("avatar", "avatar_derivatives"),
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_search_index(
+            Recipe.objects.filter(ingredients=instance).values_list(
+                "pk", flat=True
+            )
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # Списки похожих, где был рецепт, пересчитает build_similar_recipes.
+    Recipe.objects.filter(similar_recipes__similar=instance).update(
+        similar_updated=None
+    )
+
+
+@receiver(pre_delete, sender=Favorite)
+@receiver(pre_delete, sender=ShoppingCart)
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=Subscription)
+def counted_row_deleting(sender, instance, **kwargs):
+    # Удаление в админке или каскадом (например, вместе с автором);
+    # API сдвигает счетчики само.
+    if not deletes_accounted.get():
+        shift_row_counters(instance, -1, **list_score_values(sender, -1))
+
+
+@receiver(pre_delete, sender=Subscription)
+def subscription_deleting(sender, instance, **kwargs):
+    # Счетчик уже сдвинут (counted_row_deleting): автор мог перейти
+    # порог FEED_FANOUT_MAX_SUBSCRIBERS.
+    if not deletes_accounted.get():
+        subscribers_changed(instance.author_id, -1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    if not deletes_accounted.get():
+        prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_entry_deleting(sender, instance, **kwargs):
+    # Удаление в админке или каскадом вместе с рецептом или
+    # пользователем: ингредиенты рецепта еще не удалены.
+    if not deletes_accounted.get():
+        change_totals(
+            [instance.user_id], negate(recipe_amounts([instance.recipe_id]))
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        recipe_ids.add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    remove_from_search_index([instance.pk])
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recipe_ids.remove(recipe_id))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    # Бит освобождается для новых тегов, поэтому снимается со всех масок.
+    if instance.bit is not None:
+        Recipe.objects.with_tags([instance]).update(
+            tags_mask=F("tags_mask").bitand(~instance.mask)
+        )
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipe_image_derivatives")
+@receiver(post_save, sender=User, dispatch_uid="user_avatar_derivatives")
+def image_saved(sender, instance, **kwargs):
+    field_name, derivatives_field = IMAGE_FIELDS[sender]
+    if derivatives.needs_derivatives(
+        instance, field_name, derivatives_field
+    ):
+        derivatives.schedule(instance, field_name, derivatives_field)
@@ -0,0 +1,168 @@
+"""Похожие рецепты: косинусное сходство наборов ингредиентов и тегов.
+
+Каждый рецепт - строка разреженной матрицы рецепт x (ингредиенты и теги)
+с единицами для ингредиентов и TAG_WEIGHT для тегов. После нормировки
+строк сходство всех пар - одно разреженное произведение X * X^T, которое
+считается порциями строк. Для каждого рецепта хранятся
+SIMILAR_RECIPES_COUNT ближайших рецептов (SimilarRecipe).
+
+Пересчитываются только рецепты, измененные после прошлого расчета
+(Recipe.updated > Recipe.similar_updated), и рецепты, в чьих списках
+измененный рецепт был или теперь должен появиться.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+# Вес совпадения тега относительно совпадения ингредиента.
+TAG_WEIGHT = 0.5
+BATCH_SIZE = 500
+
+
+def stale_recipes():
+    """Рецепты, похожие на которые еще не посчитаны или устарели."""
+    return Recipe.objects.filter(
+        Q(similar_updated__isnull=True) | Q(similar_updated__lt=F("updated"))
+    )
+
+
+def build_matrix():
+    """Нормированная матрица рецептов и id рецептов по строкам."""
+    recipe_ids = np.array(
+        Recipe.objects.order_by("pk").values_list("pk", flat=True),
+        dtype=np.int64,
+    )
+    ingredients = pairs(RecipeIngredient.objects.values_list(
+        "recipe_id", "ingredient_id"
+    ), recipe_ids)
+    tags = pairs(Recipe.tags.through.objects.values_list(
+        "recipe_id", "tag_id"
+    ), recipe_ids)
+    # Столбцы: сначала ингредиенты, затем теги.
+    tag_offset = int(ingredients[:, 1].max(initial=0)) + 1
+    rows = np.searchsorted(
+        recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+    )
+    columns = np.concatenate((ingredients[:, 1], tags[:, 1] + tag_offset))
+    values = np.concatenate((
+        np.ones(len(ingredients)), np.full(len(tags), TAG_WEIGHT)
+    ))
+    matrix = sparse.csr_matrix(
+        (values, (rows, columns)),
+        shape=(len(recipe_ids), int(columns.max(initial=0)) + 1),
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix, recipe_ids
+
+
+def pairs(values, recipe_ids):
+    """Пары (id рецепта, id столбца) только для рецептов из recipe_ids:
+    рецепты, созданные во время чтения, в матрицу не попадают."""
+    values = np.array(values, dtype=np.int64).reshape(-1, 2)
+    return values[np.isin(values[:, 0], recipe_ids)]
+
+
+def rows_of(recipe_ids, ids):
+    """Номера строк матрицы для рецептов ids (удаленные пропускаются)."""
+    return np.flatnonzero(np.isin(recipe_ids, list(ids)))
+
+
+def similarities(matrix, rows):
+    """Сходство строк rows со всеми рецептами (без самих себя)."""
+    scores = (matrix[rows] @ matrix.T).tocoo()
+    keep = (scores.col != rows[scores.row]) & (scores.data > 0)
+    return sparse.csr_matrix(
+        (scores.data[keep], (scores.row[keep], scores.col[keep])),
+        shape=scores.shape,
+    )
+
+
+def top(scores, count):
+    """Индексы и значения count наибольших сходств каждой строки."""
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values = scores.data[start:end]
+        columns = scores.indices[start:end]
+        if len(values) > count:
+            best = np.argpartition(-values, count)[:count]
+            values, columns = values[best], columns[best]
+        order = np.argsort(-values, kind="stable")
+        yield columns[order], values[order]
+
+
+def affected_recipes(matrix, recipe_ids, changed_rows):
+    """Рецепты, в чьих списках может появиться или измениться один из
+    измененных рецептов."""
+    count = settings.SIMILAR_RECIPES_COUNT
+    changed_ids = recipe_ids[changed_rows].tolist()
+    affected = set(
+        SimilarRecipe.objects.filter(similar_id__in=changed_ids)
+        .values_list("recipe_id", flat=True)
+    )
+    # Наименьшее хранимое сходство у рецептов с полным списком.
+    thresholds = dict(
+        SimilarRecipe.objects.order_by().values("recipe_id")
+        .annotate(total=Count("pk"), lowest=Min("score"))
+        .filter(total__gte=count)
+        .values_list("recipe_id", "lowest")
+    )
+    for start in range(0, len(changed_rows), BATCH_SIZE):
+        scores = similarities(matrix, changed_rows[start:start + BATCH_SIZE])
+        best = np.asarray(scores.max(axis=0).todense()).ravel()
+        for row in np.flatnonzero(best):
+            recipe_id = int(recipe_ids[row])
+            if best[row] > thresholds.get(recipe_id, 0):
+                affected.add(recipe_id)
+    return affected
+
+
+def store(matrix, recipe_ids, rows):
+    count = settings.SIMILAR_RECIPES_COUNT
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        scores = similarities(matrix, batch)
+        entries = [
+            SimilarRecipe(
+                recipe_id=int(recipe_ids[row]),
+                similar_id=int(recipe_ids[column]),
+                score=float(score),
+            )
+            for row, (columns, values) in zip(batch, top(scores, count))
+            for column, score in zip(columns, values)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=recipe_ids[batch].tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(entries)
+
+
+def update_similar(full=False):
+    """Пересчитывает похожие рецепты (все при full).
+
+    Возвращает число пересчитанных рецептов.
+    """
+    started = timezone.now()
+    changed = Recipe.objects.all() if full else stale_recipes()
+    changed_ids = list(changed.values_list("pk", flat=True))
+    if not changed_ids:
+        return 0
+    matrix, recipe_ids = build_matrix()
+    changed_rows = rows_of(recipe_ids, changed_ids)
+    rows = changed_rows
+    if not full:
+        rows = np.union1d(changed_rows, rows_of(
+            recipe_ids, affected_recipes(matrix, recipe_ids, changed_rows)
+        ))
+    store(matrix, recipe_ids, rows)
+    # Рецепты, измененные во время расчета, останутся устаревшими.
+    Recipe.objects.filter(pk__in=changed_ids, updated__lte=started).update(
+        similar_updated=started
+    )
+    return len(rows)
@@ -0,0 +1,118 @@
+import base64
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from recipes.counters import recount
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACVBMVEUAAAD///9fX1/S0e"
+    "cCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5E"
+    "rkJggg=="
+)
+
+
+def make_user(name, **fields):
+    return User.objects.create_user(
+        email=f"{name}@example.com",
+        username=name,
+        first_name="Имя",
+        last_name="Фамилия",
+        password="pass-12345",
+        **fields,
+    )
+
+
+def make_recipe(author, ingredients=(), name="Рецепт"):
+    """Рецепт с ингредиентами ``((ингредиент, количество), ...)``."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text="Описание",
+        image="recipes/images/test.png",
+        cooking_time=5,
+    )
+    for ingredient, amount in ingredients:
+        recipe.recipe_ingredients.create(ingredient=ingredient, amount=amount)
+    return recipe
+
+
+def image_upload():
+    return SimpleUploadedFile("test.png", PNG, content_type="image/png")
+
+
+class AdminTestCase(TestCase):
+    """Данные для проверок через админку: суперпользователь, теги,
+    ингредиенты; загруженные картинки пишутся во временный каталог."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            username="admin",
+            first_name="Админ",
+            last_name="Админ",
+            password="pass-12345",
+        )
+        cls.tag = Tag.objects.create(name="Завтрак", slug="breakfast")
+        cls.salt = Ingredient.objects.create(
+            name="соль", measurement_unit="г"
+        )
+        cls.flour = Ingredient.objects.create(
+            name="мука", measurement_unit="г"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def recipe_form(self, author, ingredients, recipe=None):
+        """Данные формы рецепта в админке с инлайнами ингредиентов
+        ``((ингредиент, количество, удалить), ...)``."""
+        items = list(recipe.recipe_ingredients.all()) if recipe else []
+        data = {
+            "author": author.pk,
+            "name": recipe.name if recipe else "Рецепт",
+            "cooking_time": 5,
+            "text": "Описание",
+            "tags": [self.tag.pk],
+            "recipe_ingredients-TOTAL_FORMS": len(ingredients),
+            "recipe_ingredients-INITIAL_FORMS": len(items),
+            "recipe_ingredients-MIN_NUM_FORMS": 0,
+            "recipe_ingredients-MAX_NUM_FORMS": 1000,
+        }
+        if recipe is None:
+            data["image"] = image_upload()
+        for number, (ingredient, amount, delete) in enumerate(ingredients):
+            prefix = f"recipe_ingredients-{number}-"
+            if number < len(items):
+                data[prefix + "id"] = items[number].pk
+                data[prefix + "recipe"] = recipe.pk
+            data[prefix + "ingredient"] = ingredient.pk
+            data[prefix + "amount"] = amount
+            if delete:
+                data[prefix + "DELETE"] = "on"
+        return data
+
+    def assertCountersConsistent(self):
+        self.assertEqual(
+            {name: drift for name, drift in recount(dry_run=True).items()
+             if drift},
+            {},
+        )
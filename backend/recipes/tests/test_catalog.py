@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+
+from api.ingredient_search import ingredient_index
+from recipes.catalog import (CATALOG_VERSION_KEY, bump_catalog_version,
+                             get_catalog_version)
+from recipes.models import Ingredient, Tag
+from recipes.versions import SharedVersion
+
+
+class CatalogVersionTests(TestCase):
+    """Версия справочников общая для всех процессов: каждый процесс
+    обращается к кэшу через свой объект бэкенда и держит копию версии."""
+
+    def other_process(self):
+        """Версия справочников в другом процессе."""
+        return mock.patch(
+            "recipes.versions.caches",
+            {"default": caches.create_connection("default")},
+        ), SharedVersion(CATALOG_VERSION_KEY)
+
+    def test_cache_is_shared(self):
+        self.assertNotIsInstance(caches["default"], (LocMemCache, DummyCache))
+
+    def test_bump_is_visible_to_other_processes(self):
+        before = get_catalog_version()
+        bump_catalog_version()
+        patch, other = self.other_process()
+        with patch:
+            after = other.get()
+        self.assertNotEqual(after, before)
+        self.assertEqual(after, get_catalog_version())
+
+    def test_bump_in_other_process(self):
+        before = get_catalog_version()
+        patch, other = self.other_process()
+        with patch:
+            other.bump()
+        # До истечения SHARED_VERSION_TTL действует копия процесса.
+        with self.assertNumQueries(0):
+            self.assertEqual(get_catalog_version(), before)
+        with override_settings(SHARED_VERSION_TTL=0):
+            self.assertNotEqual(get_catalog_version(), before)
+
+    def test_not_modified_without_queries(self):
+        Tag.objects.create(name="Завтрак", slug="breakfast")
+        response = self.client.get("/api/tags/")
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                "/api/tags/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["Vary"], response["Vary"])
+
+    def test_cached_tags_invalidated_by_other_process(self):
+        Tag.objects.create(name="Завтрак", slug="breakfast")
+        response = self.client.get("/api/tags/")
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+            .status_code,
+            304,
+        )
+        patch, other = self.other_process()
+        with patch:
+            other.bump()
+        with override_settings(SHARED_VERSION_TTL=0):
+            response = self.client.get(
+                "/api/tags/", HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_ingredient_search_etag_survives_index_rebuild(self):
+        Ingredient.objects.create(name="соль", measurement_unit="г")
+        params = {"search": "со"}
+        etag = self.client.get("/api/ingredients/", params)["ETag"]
+        ingredient_index.build()
+        response = self.client.get(
+            "/api/ingredients/", params, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
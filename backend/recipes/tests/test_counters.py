@@ -0,0 +1,184 @@
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .base import AdminTestCase, make_recipe, make_user
+from api.views import RecipeViewSet
+from recipes.admin import RecipeAdmin
+from recipes.counters import recount
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+class AdminCountersTests(AdminTestCase):
+    """Счетчики при изменениях через админку и каскадных удалениях."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = make_user("author")
+        self.reader = make_user("reader")
+        self.recipe = make_recipe(self.author)
+        recount()
+
+    def refresh(self, obj):
+        obj.refresh_from_db()
+        return obj
+
+    def test_add_recipe(self):
+        response = self.client.post(
+            reverse("admin:recipes_recipe_add"),
+            self.recipe_form(self.author, ((self.salt, 5, False),)),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.refresh(self.author).recipes_count, 2)
+        self.assertCountersConsistent()
+
+    def test_change_recipe_author(self):
+        response = self.client.post(
+            reverse("admin:recipes_recipe_change", args=(self.recipe.pk,)),
+            self.recipe_form(self.reader, (), self.recipe),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.refresh(self.author).recipes_count, 0)
+        self.assertEqual(self.refresh(self.reader).recipes_count, 1)
+        self.assertCountersConsistent()
+
+    def test_add_and_delete_favorite(self):
+        self.client.post(
+            reverse("admin:recipes_favorite_add"),
+            {"user": self.reader.pk, "recipe": self.recipe.pk},
+        )
+        recipe = self.refresh(self.recipe)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertGreater(recipe.trending_score, 0)
+        favorite = Favorite.objects.get()
+        self.client.post(
+            reverse("admin:recipes_favorite_delete", args=(favorite.pk,)),
+            {"post": "yes"},
+        )
+        recipe = self.refresh(self.recipe)
+        self.assertEqual(recipe.favorites_count, 0)
+        self.assertEqual(recipe.trending_score, 0)
+        self.assertCountersConsistent()
+
+    def test_delete_selected_subscriptions(self):
+        other = make_user("other")
+        subscriptions = [
+            Subscription.objects.create(user=user, author=self.author)
+            for user in (self.reader, other)
+        ]
+        recount()
+        self.client.post(reverse("admin:users_subscription_changelist"), {
+            "action": "delete_selected",
+            "_selected_action": [item.pk for item in subscriptions],
+            "post": "yes",
+        })
+        self.assertFalse(Subscription.objects.exists())
+        self.assertEqual(self.refresh(self.author).subscribers_count, 0)
+        self.assertEqual(self.refresh(other).subscriptions_count, 0)
+        self.assertCountersConsistent()
+
+    def test_delete_recipe(self):
+        self.client.post(
+            reverse("admin:recipes_recipe_delete", args=(self.recipe.pk,)),
+            {"post": "yes"},
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.refresh(self.author).recipes_count, 0)
+        self.assertCountersConsistent()
+
+    def test_cascade_user_delete(self):
+        Subscription.objects.create(user=self.reader, author=self.author)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        other_recipe = make_recipe(self.reader)
+        Favorite.objects.create(user=self.author, recipe=other_recipe)
+        recount()
+        self.reader.delete()
+        recipe = self.refresh(self.recipe)
+        self.assertEqual(recipe.favorites_count, 0)
+        self.assertEqual(recipe.shopping_cart_count, 0)
+        author = self.refresh(self.author)
+        self.assertEqual(author.subscribers_count, 0)
+        self.assertCountersConsistent()
+        User.objects.filter(pk=self.author.pk).delete()
+        self.assertCountersConsistent()
+
+
+class LostUpdateTests(AdminTestCase):
+    """Правка рецепта не перезаписывает счетчики, измененные другим
+    запросом после того, как рецепт был загружен."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = make_user("author")
+        self.reader = make_user("reader")
+        self.recipe = make_recipe(self.author, ((self.salt, 5),))
+        recount()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+
+    def interleaved(self, owner, method):
+        """Пока правка держит загруженный рецепт, читатель добавляет его
+        в избранное и в список покупок."""
+        load = getattr(owner, method)
+
+        def load_and_favorite(*args, **kwargs):
+            obj = load(*args, **kwargs)
+            for path in ("favorite", "shopping_cart"):
+                response = self.reader_client.post(
+                    f"/api/recipes/{self.recipe.pk}/{path}/"
+                )
+                self.assertEqual(response.status_code, 201)
+            return obj
+        return mock.patch.object(owner, method, load_and_favorite)
+
+    def assertCountersKept(self, name):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.name, name)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.shopping_cart_count, 1)
+        self.assertGreater(recipe.trending_score, 0)
+        self.assertCountersConsistent()
+
+    def test_api_edit(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.interleaved(RecipeViewSet, "get_object"):
+            response = client.patch(
+                f"/api/recipes/{self.recipe.pk}/",
+                {
+                    "name": "Новое название",
+                    "ingredients": [{"id": self.salt.pk, "amount": 5}],
+                    "tags": [self.tag.pk],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountersKept("Новое название")
+
+    def test_admin_edit(self):
+        data = self.recipe_form(
+            self.author, ((self.salt, 5, False),), self.recipe
+        )
+        data["name"] = "Новое название"
+        with self.interleaved(RecipeAdmin, "get_object"):
+            response = self.client.post(
+                reverse("admin:recipes_recipe_change", args=(self.recipe.pk,)),
+                data,
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertCountersKept("Новое название")
+
+    def test_user_save_keeps_counters(self):
+        author = User.objects.get(pk=self.author.pk)
+        make_recipe(self.author)
+        Subscription.objects.create(user=self.reader, author=self.author)
+        recount()
+        author.first_name = "Другое"
+        author.save()
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(author.first_name, "Другое")
+        self.assertEqual(author.recipes_count, 2)
+        self.assertEqual(author.subscribers_count, 1)
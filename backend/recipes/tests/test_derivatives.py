@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import TransactionTestCase, override_settings
+
+from recipes import derivatives
+from recipes.models import Recipe
+from recipes.tests.base import image_upload, make_user
+
+
+class DerivativesPoolTests(TransactionTestCase):
+    """Копии строятся в пуле потоков после фиксации транзакции."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.author = make_user("author")
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author,
+            name="Рецепт",
+            text="Описание",
+            image=image_upload(),
+            cooking_time=5,
+        )
+
+    def test_disabled_in_tests(self):
+        with mock.patch.object(derivatives, "get_executor") as get_executor:
+            recipe = self.create_recipe()
+        get_executor.assert_not_called()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_derivatives, {})
+
+    @override_settings(IMAGE_DERIVATIVES_ENABLED=True)
+    def test_built_in_pool(self):
+        done = threading.Event()
+        run = derivatives.run
+
+        def run_and_signal(*args):
+            try:
+                run(*args)
+            finally:
+                done.set()
+
+        with mock.patch.object(derivatives, "run", run_and_signal):
+            recipe = self.create_recipe()
+            self.assertTrue(done.wait(10))
+        recipe.refresh_from_db()
+        self.assertEqual(
+            recipe.image_derivatives["source"], recipe.image.name
+        )
+        for width in settings.IMAGE_DERIVATIVE_WIDTHS:
+            for name in recipe.image_derivatives[str(width)].values():
+                self.assertTrue(default_storage.exists(name), name)
@@ -0,0 +1,81 @@
+from django.urls import reverse
+
+from .base import AdminTestCase, make_recipe, make_user
+from recipes.models import Recipe, ShoppingCart, ShoppingCartIngredient
+from recipes.shopping_cart import verify
+
+
+class ShoppingCartTotalsTests(AdminTestCase):
+    """Суммы списков покупок при изменениях через админку и каскадных
+    удалениях."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = make_user("author")
+        self.reader = make_user("reader")
+        self.recipe = make_recipe(
+            self.author, ((self.salt, 5), (self.flour, 200))
+        )
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+        verify([self.reader.pk], fix=True)
+
+    def totals(self):
+        return dict(
+            ShoppingCartIngredient.objects.filter(user=self.reader)
+            .values_list("ingredient__name", "amount")
+        )
+
+    def assertTotalsConsistent(self):
+        self.assertEqual(verify([self.reader.pk, self.author.pk]), 0)
+
+    def test_admin_inline_changes(self):
+        response = self.client.post(
+            reverse("admin:recipes_recipe_change", args=(self.recipe.pk,)),
+            self.recipe_form(
+                self.author,
+                ((self.salt, 7, False), (self.flour, 200, True)),
+                self.recipe,
+            ),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(), {"соль": 7})
+        self.assertTotalsConsistent()
+
+    def test_admin_delete_recipe(self):
+        self.client.post(
+            reverse("admin:recipes_recipe_delete", args=(self.recipe.pk,)),
+            {"post": "yes"},
+        )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.totals(), {})
+        self.assertTotalsConsistent()
+
+    def test_admin_delete_selected_recipes(self):
+        self.client.post(reverse("admin:recipes_recipe_changelist"), {
+            "action": "delete_selected",
+            "_selected_action": [self.recipe.pk],
+            "post": "yes",
+        })
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(self.totals(), {})
+        self.assertTotalsConsistent()
+
+    def test_admin_add_and_delete_cart_entry(self):
+        other = make_recipe(self.author, ((self.salt, 3),), name="Другой")
+        self.client.post(
+            reverse("admin:recipes_shoppingcart_add"),
+            {"user": self.reader.pk, "recipe": other.pk},
+        )
+        self.assertEqual(self.totals(), {"соль": 8, "мука": 200})
+        entry = ShoppingCart.objects.get(recipe=self.recipe)
+        self.client.post(
+            reverse("admin:recipes_shoppingcart_delete", args=(entry.pk,)),
+            {"post": "yes"},
+        )
+        self.assertEqual(self.totals(), {"соль": 3})
+        self.assertTotalsConsistent()
+
+    def test_cascade_author_delete(self):
+        self.author.delete()
+        self.assertEqual(self.totals(), {})
+        self.assertTotalsConsistent()
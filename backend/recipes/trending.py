@@ -0,0 +1,67 @@
+"""Популярность рецептов за последнее время (Recipe.trending_score).
+
+Добавление рецепта в избранное или список покупок прибавляет к счету вес
+из WEIGHTS, удаление - вычитает его в том же UPDATE, что и счетчики.
+Команда decay_trending периодически уменьшает все счета вдвое за каждые
+TRENDING_HALF_LIFE_HOURS часов, поэтому давние добавления перестают
+влиять на порядок. Удаление давнего добавления вычитает полный вес, счет
+при этом не опускается ниже нуля.
+"""
+from django.conf import settings
+from django.db.models import F, Max, Min, Value
+from django.db.models.functions import Greatest
+
+from .models import Favorite, Recipe, ShoppingCart
+
+WEIGHTS = {
+    Favorite: 1.0,
+    ShoppingCart: 2.0,
+}
+# Меньшие счета после уменьшения обнуляются.
+MIN_SCORE = 0.01
+BATCH_SIZE = 10000
+
+
+def score_change(model, delta):
+    """Выражение для нового счета после delta добавлений в список model."""
+    return Greatest(
+        F("trending_score") + delta * WEIGHTS[model], Value(0.0)
+    )
+
+
+def list_score_values(model, delta):
+    """Значения для UPDATE рецепта после delta добавлений в список model
+    (пусто для моделей, не влияющих на популярность)."""
+    if model not in WEIGHTS:
+        return {}
+    return {"trending_score": score_change(model, delta)}
+
+
+def decay(hours):
+    """Уменьшает счета с учетом hours прошедших часов.
+
+    Строки обновляются порциями по диапазонам id, чтобы не блокировать
+    надолго добавление рецептов в списки. Возвращает число рецептов.
+    """
+    factor = 0.5 ** (hours / settings.TRENDING_HALF_LIFE_HOURS)
+    scored = Recipe.objects.filter(trending_score__gt=0)
+    bounds = scored.aggregate(first=Min("pk"), last=Max("pk"))
+    if bounds["first"] is None:
+        return 0
+    updated = 0
+    for start in range(bounds["first"], bounds["last"] + 1, BATCH_SIZE):
+        batch = scored.filter(pk__gte=start, pk__lt=start + BATCH_SIZE)
+        batch.filter(trending_score__lt=MIN_SCORE / factor).update(
+            trending_score=0
+        )
+        updated += batch.update(trending_score=F("trending_score") * factor)
+    return updated
+
+
+def seed_from_counters(queryset):
+    """Выставляет счета по общему числу добавлений (для тестовых данных,
+    у которых нет истории добавлений)."""
+    return queryset.update(trending_score=(
+        F("favorites_count") * WEIGHTS[Favorite]
+        + F("shopping_cart_count") * WEIGHTS[ShoppingCart]
+    ))
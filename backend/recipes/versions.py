@@ -0,0 +1,62 @@
+"""Общие для процессов версии данных, которые процессы кэшируют у себя.
+
+Версия хранится в общем кэше Django (по умолчанию - таблица в базе) и
+меняется при изменении данных. Каждый процесс держит копию версии и
+перечитывает ее не чаще раза в SHARED_VERSION_TTL секунд, поэтому
+запросы между перечитываниями не обращаются ни к кэшу, ни к базе, а
+изменение в другом процессе становится видно не позже чем через
+SHARED_VERSION_TTL.
+"""
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+
+class SharedVersion:
+    """Версия по ключу key в кэше alias и ее копия в процессе."""
+
+    def __init__(self, key, alias=DEFAULT_CACHE_ALIAS):
+        self.key = key
+        self.alias = alias
+        # (версия, время чтения); заменяется одним присваиванием.
+        self.state = (None, None)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def local(self):
+        """Копия версии, если она прочитана меньше SHARED_VERSION_TTL
+        секунд назад, иначе None. Не обращается к кэшу, поэтому
+        вызывается и в цикле событий."""
+        value, checked_at = self.state
+        if checked_at is None or (
+            time.monotonic() - checked_at > settings.SHARED_VERSION_TTL
+        ):
+            return None
+        return value
+
+    def get(self):
+        """Текущая версия (перечитывается, если копия устарела)."""
+        value = self.local()
+        if value is None:
+            value = self.refresh()
+        return value
+
+    def refresh(self):
+        checked_at = time.monotonic()
+        value = self.cache.get(self.key)
+        if value is None:
+            self.cache.add(self.key, uuid4().hex, None)
+            value = self.cache.get(self.key)
+        self.state = (value, checked_at)
+        return value
+
+    def bump(self):
+        """Новая версия: копии данных во всех процессах устарели."""
+        value = uuid4().hex
+        self.cache.set(self.key, value, None)
+        self.state = (value, time.monotonic())
+        return value
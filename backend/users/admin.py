@@ -3,10 +3,21 @@ from django.contrib.auth.admin import UserAdmin as AuthUserAdmin
 from django.contrib.auth.models import Group
 
 from .models import Subscription, User
+from recipes.admin import CountersAdminMixin
+from recipes.feed import backfill, prune, subscribers_changed
 
 
 class UserAdmin(AuthUserAdmin):
 
+    list_display = (
+        "username",
+        "email",
+        "first_name",
+        "last_name",
+        "recipes_count",
+        "subscribers_count",
+        "subscriptions_count",
+    )
     list_display_links = (
         "username",
         "email",
@@ -17,14 +28,38 @@ class UserAdmin(AuthUserAdmin):
     list_filter = (
         "username", "email", "is_staff", "is_superuser", "is_active"
     )
+    readonly_fields = (
+        "recipes_count", "subscribers_count", "subscriptions_count"
+    )
+    fieldsets = AuthUserAdmin.fieldsets + (
+        (
+            "Статистика",
+            {
+                "fields": (
+                    "recipes_count",
+                    "subscribers_count",
+                    "subscriptions_count",
+                )
+            },
+        ),
+    )
 
 
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(CountersAdminMixin, admin.ModelAdmin):
     list_display = (
         "user",
         "author",
     )
 
+    def count_row(self, obj, delta):
+        # Лента подписчика меняется так же, как при подписке через API.
+        if delta > 0:
+            backfill(obj.user_id, obj.author)
+        else:
+            prune(obj.user_id, obj.author_id)
+        super().count_row(obj, delta)
+        subscribers_changed(obj.author_id, delta)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Subscription, SubscriptionAdmin)
@@ -7,7 +7,32 @@ from .constants import MAX_EMAIL_LENGTH, MAX_NAME_LENGTH
 from .validators import first_name_validator, last_name_validator
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    """Сохранение существующей строки без update_fields не записывает
+    поля denormalized_fields: их меняют отдельные запросы UPDATE
+    (счетчики, копии картинок), и значения, загруженные вместе с
+    объектом, могли устареть."""
+
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     """Модель для пользователей."""
 
     USERNAME_FIELD = "email"
@@ -55,6 +80,26 @@ class User(AbstractUser):
     avatar = models.ImageField(
         verbose_name="Аватар", upload_to="users/", blank=True, null=True
     )
+    # Заполняется в recipes.derivatives после загрузки аватара.
+    avatar_derivatives = models.JSONField(
+        verbose_name="Уменьшенные копии аватара", default=dict, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Число рецептов", default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name="Число подписчиков", default=0, editable=False
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        verbose_name="Число подписок", default=0, editable=False
+    )
+
+    denormalized_fields = (
+        "avatar_derivatives",
+        "recipes_count",
+        "subscribers_count",
+        "subscriptions_count",
+    )
 
     class Meta:
         verbose_name = "Пользователь"